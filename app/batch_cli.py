@@ -0,0 +1,289 @@
+"""
+Xử lý hàng loạt video ghi sẵn (không GUI), chia cho nhiều process:
+
+    python -m app.batch_cli recordings/                     # cả thư mục
+    python -m app.batch_cli "recordings/2025-01-*/*.mp4" --workers 4 --torch-threads 2
+    python -m app.batch_cli recordings/ --force             # xử lý lại cả clip đã có kết quả
+"""
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from utils.data_logger import get_log_backend
+from utils.file_io import write_json_atomic
+
+# =========================
+# ⚙️ CONFIG
+# =========================
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BATCH_RESULTS_DIR = os.path.join(PROJECT_ROOT, "output", "batch")
+BATCH_WORKERS = 2
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+
+
+def default_torch_threads(workers):
+    """Chia đều CPU cho các worker (tránh mỗi process dùng hết core)"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+# =========================
+# 📂 DANH SÁCH CLIP
+# =========================
+def collect_videos(inputs, extensions=VIDEO_EXTENSIONS):
+    """inputs: thư mục / glob / file → list path tuyệt đối (không trùng, đã sắp xếp)"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = glob.glob(os.path.join(item, "**", "*"), recursive=True)
+        else:
+            candidates = glob.glob(item, recursive=True) or [item]
+        paths.extend(
+            os.path.abspath(p) for p in candidates
+            if os.path.isfile(p) and p.lower().endswith(extensions)
+        )
+    return sorted(set(paths))
+
+
+def result_path(video_path, results_dir=BATCH_RESULTS_DIR):
+    """File kết quả của 1 clip: <tên>_<hash path>.json (2 clip cùng tên ở 2 thư mục không đè nhau)"""
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    digest = hashlib.sha1(os.path.abspath(video_path).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(results_dir, f"{stem}_{digest}.json")
+
+
+def load_result(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _write_json(path, data):
+    # Ghi file tạm rồi rename → không để lại file kết quả ghi dở khi bị kill
+    write_json_atomic(path, data, indent=2, ensure_ascii=False)
+
+
+# =========================
+# 👷 WORKER (process con)
+# =========================
+def _init_worker(torch_threads):
+    """Giới hạn thread của torch / BLAS / OpenCV trong mỗi process (trước khi load model)"""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(torch_threads)
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+    import cv2
+    cv2.setNumThreads(torch_threads)
+
+
+def run_clip(video_path, out_path, options):
+    """Xử lý 1 clip headless, ghi + trả về tóm tắt. Lỗi Python → status "error" (không làm hỏng batch)"""
+    started = time.monotonic()
+    summary = {
+        "video": video_path,
+        "status": "running",
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "worker_pid": os.getpid()
+    }
+    # Đánh dấu "running": nếu process chết giữa chừng, batch biết clip nào đang chạy
+    _write_json(out_path, summary)
+    try:
+        from app.process_video import process_video
+
+        result = process_video(video_path, display=False, **options)
+        if result is None:
+            summary.update(status="error", error="Không thể mở video")
+        else:
+            summary.update(
+                status="ok",
+                violations=len(result["violations"]),
+                total_frames=result["total_frames"],
+                processed_frames=result["processed_frames"],
+                processing_fps=result["processing_fps"],
+                output_path=result["output_path"],
+                dropped_frames=result["dropped_frames"],
+                stages=result.get("stages")
+            )
+    except Exception as e:
+        summary.update(status="error", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+
+    summary["elapsed_s"] = round(time.monotonic() - started, 2)
+    _write_json(out_path, summary)
+    return summary
+
+
+# =========================
+# 🏭 POOL
+# =========================
+def _run_pool(jobs, workers, torch_threads, options):
+    """
+    Chạy jobs [(video, out_path)] trên 1 process pool.
+    → (summaries, broken): broken = clip dở dang khi 1 process con chết (segfault / OOM)
+    """
+    summaries, broken = [], []
+    ctx = multiprocessing.get_context("spawn")  # torch / CUDA không an toàn với fork
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(torch_threads,)) as pool:
+        futures = {pool.submit(run_clip, video, out, options): (video, out) for video, out in jobs}
+        for future in as_completed(futures):
+            video, out = futures[future]
+            try:
+                summary = future.result()
+            except BrokenProcessPool:
+                broken.append((video, out))
+                continue
+            except Exception as e:
+                summary = {"video": video, "status": "error", "error": f"{type(e).__name__}: {e}"}
+                _write_json(out, summary)
+            summaries.append(summary)
+            _print_progress(summary)
+    return summaries, broken
+
+
+def _print_progress(summary):
+    name = os.path.basename(summary["video"])
+    if summary["status"] == "ok":
+        print(f"✅ {name}: {summary['violations']} vi phạm, {summary['processed_frames']} frame, "
+              f"{summary['processing_fps']} FPS ({summary['elapsed_s']}s)", flush=True)
+    else:
+        print(f"❌ {name}: {summary['status']} – {summary.get('error')}", flush=True)
+
+
+def run_batch(videos, results_dir=BATCH_RESULTS_DIR, workers=BATCH_WORKERS, torch_threads=None,
+              force=False, options=None):
+    """
+    Xử lý list video trên process pool, bỏ qua clip đã có kết quả "ok" (trừ khi force).
+    Process con chết → pool hỏng: clip đang chạy lúc đó được chạy lại riêng (pool 1 worker)
+    để tìm đúng clip gây crash (đánh dấu "crashed"), clip chưa chạy vào pool mới.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    torch_threads = torch_threads or default_torch_threads(workers)
+    options = options or {}
+
+    jobs, skipped = [], []
+    for video in videos:
+        out = result_path(video, results_dir)
+        previous = None if force else load_result(out)
+        if previous is not None and previous.get("status") == "ok":
+            skipped.append(dict(previous, skipped=True))
+        else:
+            jobs.append((video, out))
+
+    print(f"🎞️ {len(videos)} clip: {len(jobs)} cần xử lý, {len(skipped)} đã có kết quả "
+          f"({workers} worker × {torch_threads} thread)", flush=True)
+
+    # Migrate log violations.json cũ 1 lần ở process cha, trước khi tạo pool
+    # (không để các worker cùng migrate → trùng bản ghi)
+    if jobs:
+        get_log_backend()
+
+    summaries, pending = [], jobs
+    while pending:
+        # Xóa kết quả cũ (lỗi / "running" của lần chạy trước) → marker "running" chỉ đến từ vòng này
+        for _, out in pending:
+            if os.path.exists(out):
+                os.remove(out)
+        done, broken = _run_pool(pending, workers, torch_threads, options)
+        summaries.extend(done)
+
+        in_flight = [job for job in broken if (load_result(job[1]) or {}).get("status") == "running"]
+        pending = [job for job in broken if job not in in_flight]
+        if broken and not in_flight:
+            # Pool chết trước khi chạy được clip nào (vd lỗi khởi tạo worker) → không thử lại mãi
+            in_flight, pending = broken, []
+
+        # Cô lập clip gây crash: chạy lại riêng từng clip đang chạy lúc pool hỏng
+        for video, out in in_flight:
+            retry, still_broken = _run_pool([(video, out)], 1, torch_threads, options)
+            if still_broken:
+                summary = {"video": video, "status": "crashed",
+                           "error": "Process xử lý bị dừng đột ngột (segfault / hết bộ nhớ)"}
+                _write_json(out, summary)
+                _print_progress(summary)
+                retry = [summary]
+            summaries.extend(retry)
+
+    return aggregate(skipped + summaries)
+
+
+# =========================
+# 📊 TỔNG HỢP
+# =========================
+def aggregate(summaries):
+    ok = [s for s in summaries if s.get("status") == "ok"]
+    frames = sum(s["processed_frames"] for s in ok)
+    busy = sum(s["processed_frames"] / s["processing_fps"] for s in ok if s.get("processing_fps"))
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "clips": len(summaries),
+        "ok": len(ok),
+        "skipped": sum(1 for s in summaries if s.get("skipped")),
+        "failed": len(summaries) - len(ok),
+        "violations": sum(s["violations"] for s in ok),
+        "processed_frames": frames,
+        "avg_fps": round(frames / busy, 2) if busy else None,
+        "per_clip": sorted(summaries, key=lambda s: s["video"])
+    }
+
+
+def print_summary(report):
+    print("\n📊 Tổng hợp")
+    print(f"{'Clip':<40} {'Trạng thái':<10} {'Vi phạm':>8} {'Frame':>8} {'FPS':>8}")
+    for s in report["per_clip"]:
+        status = "skipped" if s.get("skipped") else s["status"]
+        print(f"{os.path.basename(s['video'])[:40]:<40} {status:<10} {s.get('violations', '-'):>8} "
+              f"{s.get('processed_frames', '-'):>8} {s.get('processing_fps', '-'):>8}")
+    print(f"\n{report['ok']}/{report['clips']} clip OK ({report['skipped']} bỏ qua), "
+          f"{report['failed']} lỗi – {report['violations']} vi phạm, "
+          f"{report['processed_frames']} frame, FPS TB {report['avg_fps']}")
+
+
+# =========================
+# ▶️ MAIN
+# =========================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Xử lý hàng loạt video vượt đèn đỏ (không GUI)")
+    parser.add_argument("inputs", nargs="+", help="thư mục, glob hoặc file video")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="số process song song")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                        help="số thread torch / process (mặc định: số CPU / workers)")
+    parser.add_argument("--results-dir", default=BATCH_RESULTS_DIR, help="thư mục kết quả từng clip")
+    parser.add_argument("--force", action="store_true", help="xử lý lại cả clip đã có kết quả")
+    parser.add_argument("--no-video", action="store_true", help="không ghi video kết quả")
+    parser.add_argument("--instrument", action="store_true", help="đo thời gian từng bước")
+    args = parser.parse_args(argv)
+
+    videos = collect_videos(args.inputs)
+    if not videos:
+        print("⚠️ Không tìm thấy video nào.")
+        return 1
+
+    report = run_batch(
+        videos, results_dir=args.results_dir, workers=args.workers, torch_threads=args.torch_threads,
+        force=args.force, options={"save_output": not args.no_video, "instrument": args.instrument}
+    )
+    print_summary(report)
+
+    summary_path = os.path.join(args.results_dir, f"summary_{datetime.now():%Y%m%d_%H%M%S}.json")
+    _write_json(summary_path, report)
+    print(f"💾 Đã lưu: {summary_path}")
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,15 +2,19 @@ import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import streamlit as st
-import cv2
+import tempfile
 import threading
 import time
-import queue
-import glob
 import json
+import uuid
 import pandas as pd
 
 from app.process_video import process_video
+from core.model_registry import warmup
+from utils.data_logger import query_violation_records, list_violation_videos, export_violation_records
+from utils.thumbnails import thumbnail_path
+from utils.preview import PreviewChannel, PREVIEW_WIDTH, PREVIEW_MAX_FPS
+from utils.violation_index import ViolationIndex
 from app.ui_components import setup_page_style, show_header, show_violation_card, show_video_section
 
 
@@ -38,102 +42,72 @@ tab_realtime, tab_history = st.tabs(["🔴 Realtime Detection", "📁 Lịch s
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 VIOLATIONS_DIR = os.path.join(ROOT_DIR, "output", "violations")
 UPLOADS_DIR = os.path.join(ROOT_DIR, "uploads")
+HISTORY_PAGE_SIZE = 20
 os.makedirs(VIOLATIONS_DIR, exist_ok=True)
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 
 # ==========================
 # Runtime states
 # ==========================
-frame_queue = queue.Queue(maxsize=3)
 stop_flag = threading.Event()
 processing_flag = threading.Event()
 
 # Initialize session state
 if "current_thread" not in st.session_state:
     st.session_state["current_thread"] = None
-if "current_video_folder" not in st.session_state:
-    st.session_state["current_video_folder"] = None
+if "current_video" not in st.session_state:
+    st.session_state["current_video"] = None
 
 
 # ==========================
-# Nhận frame từ process_video
+# Kênh preview (frame mới nhất, JPEG thu nhỏ, encode ở thread riêng)
 # ==========================
-def update_frame(frame):
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    if not frame_queue.full():
-        frame_queue.put(frame_rgb)
+@st.cache_resource
+def get_preview_channel():
+    return PreviewChannel()
+
+
+preview = get_preview_channel()
 
 
 # ==========================
-# Load violations với cache (CHỈ video hiện tại)
+# Index vi phạm trong RAM (pipeline publish, GUI đọc – không quét thư mục ảnh)
 # ==========================
-def load_violations_cached():
-    """Load violations với cache mỗi 0.5s để tránh block UI"""
-    cache_key = "violations_cache"
-    cache_time_key = "violations_cache_time"
-    
-    current_time = time.time()
-    
-    # Check cache (refresh mỗi 0.5s)
-    if (cache_key in st.session_state and 
-        cache_time_key in st.session_state and 
-        current_time - st.session_state[cache_time_key] < 0.5):
-        return st.session_state[cache_key]
-    
-    # Chỉ load ảnh từ folder video hiện tại
-    current_folder = st.session_state.get("current_video_folder")
-    if not current_folder or not os.path.exists(current_folder):
-        st.session_state[cache_key] = {}
-        st.session_state[cache_time_key] = current_time
+@st.cache_resource
+def get_violation_index():
+    return ViolationIndex()
+
+
+violation_index = get_violation_index()
+
+
+def violation_images(event):
+    """{"crop", "context"} (đường dẫn tuyệt đối) khi ảnh bằng chứng đã ghi xong"""
+    if not event.get("evidence_ready"):
         return {}
-    
-    # Load fresh data từ folder cụ thể
-    files = sorted(
-        glob.glob(os.path.join(current_folder, "*.jpg"))
-        + glob.glob(os.path.join(current_folder, "*.png")),
-        key=lambda x: os.path.getmtime(x),
-        reverse=True
-    )
-
-    grouped = {}
-    for f in files:
-        base = os.path.basename(f)
-
-        id_base = (
-            base.split('_crop')[0]
-            if "_crop" in base else base.split('_context')[0]
-        )
-
-        if "_crop" in f:
-            grouped.setdefault(id_base, {})["crop"] = f
-        elif "_context" in f:
-            grouped.setdefault(id_base, {})["context"] = f
-    
-    # Save to cache
-    st.session_state[cache_key] = grouped
-    st.session_state[cache_time_key] = current_time
-    
-    return grouped
+    return {
+        key: os.path.join(ROOT_DIR, event[field])
+        for key, field in (("crop", "crop_image"), ("context", "context_image"))
+        if event.get(field)
+    }
 
 
 # ==========================
 # Luồng xử lý AI
 # ==========================
-def run_detection(video_path):
+def run_detection(video_path, instrument=False):
     try:
-        result = process_video(video_path, frame_callback=update_frame, display=False, stop_flag=stop_flag)
+        # Load + warm-up model ngay trong thread xử lý (không block UI)
+        warmup()
+        result = process_video(video_path, frame_callback=preview, display=False, stop_flag=stop_flag,
+                               instrument=instrument, event_index=violation_index)
         if result:
             st.session_state["last_video_result"] = result
     except Exception as e:
         st.session_state["error"] = str(e)
     finally:
         processing_flag.clear()
-        # Clear frame queue khi dừng
-        while not frame_queue.empty():
-            try:
-                frame_queue.get_nowait()
-            except:
-                break
+        preview.clear()
 
 
 # ==========================================================
@@ -145,6 +119,11 @@ with tab_realtime:
     with st.sidebar:
         st.markdown("## Cài đặt hệ thống")
         uploaded_video = st.file_uploader("Tải video lên", type=["mp4", "avi", "mov"])
+        instrument = st.checkbox("⏱️ Đo thời gian từng bước xử lý", value=False)
+        preview_width = st.select_slider("Độ rộng preview (px)", options=[480, 640, 960, 1280, 1920],
+                                         value=PREVIEW_WIDTH)
+        preview_fps = st.slider("FPS preview tối đa", min_value=1, max_value=30, value=PREVIEW_MAX_FPS)
+        preview.configure(width=preview_width, max_fps=preview_fps)
         st.divider()
         st.info("Hệ thống nhận diện vượt đèn đỏ, biển số và trạng thái đèn tự động.")
 
@@ -168,15 +147,12 @@ with tab_realtime:
             stop_flag.clear()
             processing_flag.set()
             
-            # Set folder cho video hiện tại
-            video_name = os.path.splitext(os.path.basename(video_path))[0]
-            st.session_state["current_video_folder"] = os.path.join(VIOLATIONS_DIR, video_name)
-            
-            # Clear cache cũ
-            if "violations_cache" in st.session_state:
-                del st.session_state["violations_cache"]
+            # Panel vi phạm chỉ hiện video hiện tại (bỏ sự kiện cũ của lần chạy trước)
+            video_name = os.path.basename(video_path)
+            st.session_state["current_video"] = video_name
+            violation_index.clear(video_name)
             
-            st.session_state["current_thread"] = threading.Thread(target=run_detection, args=(video_path,), daemon=True)
+            st.session_state["current_thread"] = threading.Thread(target=run_detection, args=(video_path, instrument), daemon=True)
             st.session_state["current_thread"].start()
             st.info(f"Đang xử lý video: **{os.path.basename(video_path)}**")
 
@@ -187,13 +163,7 @@ with tab_realtime:
             # Set stop flag
             stop_flag.set()
             processing_flag.clear()
-            
-            # Clear frame queue để unblock thread
-            while not frame_queue.empty():
-                try:
-                    frame_queue.get_nowait()
-                except:
-                    break
+            preview.clear()
             
             # Đợi thread tối đa 5 giây
             if st.session_state["current_thread"] and st.session_state["current_thread"].is_alive():
@@ -206,7 +176,7 @@ with tab_realtime:
                     st.success("✅ Đã dừng thành công!")
             
             st.session_state["current_thread"] = None
-            st.session_state["current_video_folder"] = None
+            st.session_state["current_video"] = None
             
             # Force rerun để clear UI
             st.rerun()
@@ -232,13 +202,16 @@ with tab_realtime:
         last_time = time.time()
         frame_count = 0
         last_violation_update = 0
+        last_index_version = -1
+        last_seq = 0
 
         while processing_flag.is_set():
 
-            # ======= FRAME =======
-            try:
-                frame = frame_queue.get(timeout=0.2)
-                frame_placeholder.image(frame, channels="RGB", use_container_width=True)
+            # ======= FRAME (JPEG đã encode sẵn, gửi thẳng) =======
+            latest = preview.latest(last_seq, timeout=0.2)
+            if latest is not None:
+                last_seq, jpeg = latest
+                frame_placeholder.image(jpeg, use_container_width=True)
                 frame_count += 1
 
                 now = time.time()
@@ -254,34 +227,34 @@ with tab_realtime:
                     last_time = now
                     frame_count = 0
 
-            except queue.Empty:
-                pass
-
-            # ======= UPDATE VIOLATIONS (chỉ mỗi 1s) =======
+            # ======= UPDATE VIOLATIONS (chỉ khi index thay đổi, tối đa mỗi 1s) =======
             current_time = time.time()
-            if current_time - last_violation_update >= 1.0:
+            if (current_time - last_violation_update >= 1.0
+                    and violation_index.version != last_index_version):
                 last_violation_update = current_time
-                
-                grouped = load_violations_cached()
+                last_index_version = violation_index.version
+
+                events = violation_index.recent(5, video=st.session_state["current_video"])
 
                 # ======= SIDEBAR (3 ảnh) =======
                 with violation_sidebar.container():
-                    if grouped:
-                        for vid, imgs in list(grouped.items())[:3]:
-                            show_violation_card(vid, imgs)
+                    if events:
+                        for event in events[:3]:
+                            show_violation_card(f"#{event['track_id']} · {event['license_plate']}",
+                                                violation_images(event))
                     else:
                         st.success("Không có vi phạm nào.")
 
                 # ======= TIMELINE (5 ảnh) =======
                 with timeline_container.container():
-                    if grouped:
-                        timeline_items = list(grouped.items())[:5]
+                    if events:
                         cols = st.columns(5)
 
-                        for i, (vid, imgs) in enumerate(timeline_items):
+                        for i, event in enumerate(events):
                             with cols[i % 5]:
+                                imgs = violation_images(event)
                                 if "crop" in imgs:
-                                    st.image(imgs["crop"], caption=f"#{vid}", use_container_width=True)
+                                    st.image(imgs["crop"], caption=f"#{event['track_id']}", use_container_width=True)
                     else:
                         st.info("Chưa có dữ liệu vi phạm.")
 
@@ -292,6 +265,15 @@ with tab_realtime:
             result = st.session_state.pop("last_video_result")
             st.success(f"Hoàn tất xử lý video. Ghi nhận {len(result['violations'])} vi phạm.")
             st.write(f"Kết quả lưu tại: `{result['output_path']}`")
+            if result.get("processing_fps"):
+                st.write(f"⚡ Tốc độ xử lý: **{result['processing_fps']} FPS** ({result['processed_frames']} frame)")
+
+            # Thời gian từng bước (p50 / p95 / p99)
+            if result.get("stages"):
+                with st.expander("⏱️ Thời gian từng bước xử lý"):
+                    stages_df = pd.DataFrame.from_dict(result["stages"], orient="index")
+                    stages_df.index.name = "stage"
+                    st.dataframe(stages_df, use_container_width=True)
 
         if "error" in st.session_state:
             st.error(f"Lỗi xử lý: {st.session_state.pop('error')}")
@@ -302,59 +284,110 @@ with tab_realtime:
 # ==========================================================
 # ⭐ TAB 2 – HISTORY
 # ==========================================================
+def show_history_record(r):
+    """1 bản ghi lịch sử: thumbnail (cache trên đĩa), ảnh gốc chỉ tải khi bấm xem"""
+    st.markdown("---")
+    st.write(f"🚗 Loại xe: {r['vehicle_type']}")
+    st.write(f"🔢 Biển số: **{r['license_plate']}**")
+    if r.get('province') and r['province'] != 'Unknown':
+        st.write(f"📍 Tỉnh/TP: **{r['province']}**")
+    st.write(f"🕒 Thời gian: {r['timestamp']}  ·  🎞️ {r.get('video', '')}")
+
+    paths = [
+        os.path.join(ROOT_DIR, r[field]) if r.get(field) else None
+        for field in ("crop_image", "context_image")
+    ]
+    thumbs = [thumbnail_path(p) if p else None for p in paths]
+    if not any(thumbs):
+        st.caption("⚠️ File ảnh đã bị xóa.")
+        return
+
+    show_full = st.toggle("🔍 Xem ảnh gốc", key=f"full_{r.get('record_id') or r['crop_image']}")
+    cols = st.columns(2)
+    for col, path, thumb, caption in zip(cols, paths, thumbs, ("📍 Xe vi phạm", "📷 Toàn cảnh")):
+        if thumb is None:
+            continue
+        with col:
+            st.image(path if show_full else thumb, caption=caption, use_container_width=True)
+
+
 with tab_history:
 
     st.subheader("📁 Lịch sử vi phạm đã lưu")
 
-    records_file = os.path.join(VIOLATIONS_DIR, "violations.json")
-
-    if not os.path.exists(records_file):
-        st.info("Chưa có dữ liệu vi phạm nào.")
+    # ======= BỘ LỌC =======
+    f_video, f_plate, f_from, f_to = st.columns([0.3, 0.3, 0.2, 0.2])
+    with f_video:
+        video_filter = st.selectbox("Video", ["(Tất cả)"] + list_violation_videos())
+    with f_plate:
+        plate_filter = st.text_input("Biển số (chứa)", "").strip()
+    with f_from:
+        date_from = st.date_input("Từ ngày", value=None)
+    with f_to:
+        date_to = st.date_input("Đến ngày", value=None)
+
+    filters = {
+        "video": None if video_filter == "(Tất cả)" else video_filter,
+        "plate": plate_filter or None,
+        "date_from": date_from,
+        "date_to": date_to
+    }
+
+    # Đổi bộ lọc → quay về trang 1
+    filter_key = json.dumps(filters, default=str)
+    if st.session_state.get("history_filter_key") != filter_key:
+        st.session_state["history_filter_key"] = filter_key
+        st.session_state["history_page"] = 1
+
+    # Lọc + phân trang ở backend: chỉ lấy HISTORY_PAGE_SIZE bản ghi / lần render
+    page = st.session_state.get("history_page", 1)
+    total, records = query_violation_records(offset=(page - 1) * HISTORY_PAGE_SIZE,
+                                             limit=HISTORY_PAGE_SIZE, **filters)
+    pages = max(1, (total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE)
+    if page > pages:
+        page = st.session_state["history_page"] = pages
+        total, records = query_violation_records(offset=(page - 1) * HISTORY_PAGE_SIZE,
+                                                 limit=HISTORY_PAGE_SIZE, **filters)
+
+    if not total:
+        st.info("Chưa có dữ liệu vi phạm nào." if not any(filters.values())
+                else "Không có vi phạm nào khớp bộ lọc.")
     else:
-        with open(records_file, "r", encoding="utf-8") as f:
-            records = json.load(f)
-
-        # Lọc chỉ các record có file ảnh tồn tại
-        valid_records = []
+        info_col, page_col = st.columns([0.7, 0.3])
+        with info_col:
+            st.success(f"Tìm thấy {total} vi phạm · {pages} trang")
+        with page_col:
+            st.number_input("Trang", min_value=1, max_value=pages, key="history_page")
+
+        # JSON raw (trang hiện tại)
+        with st.expander("📄 Xem JSON (trang hiện tại)"):
+            st.json(records)
+
+        # Ảnh vi phạm
+        st.markdown("### 📸 Hình ảnh vi phạm")
         for r in records:
-            crop_exists = os.path.exists(os.path.join(ROOT_DIR, r["crop_image"]))
-            context_exists = os.path.exists(os.path.join(ROOT_DIR, r["context_image"]))
-            if crop_exists and context_exists:
-                valid_records.append(r)
-
-        if not valid_records:
-            st.info("Không có dữ liệu vi phạm hợp lệ (file ảnh đã bị xóa).")
-        else:
-            st.success(f"Tìm thấy {len(valid_records)}/{len(records)} vi phạm hợp lệ")
+            show_history_record(r)
 
-            
+        st.markdown("---")
 
-            # JSON raw
-            with st.expander("📄 Xem JSON"):
-                st.json(valid_records)
-
-            # Ảnh vi phạm
-            st.markdown("### 📸 Hình ảnh vi phạm")
-            for r in valid_records:
-                st.markdown("---")
-                st.write(f"🚗 Loại xe: {r['vehicle_type']}")
-                st.write(f"🔢 Biển số: **{r['license_plate']}**")
-                if r.get('province') and r['province'] != 'Unknown':
-                    st.write(f"📍 Tỉnh/TP: **{r['province']}**")
-                st.write(f"🕒 Thời gian: {r['timestamp']}")
-
-                cols = st.columns(2)
-                with cols[0]:
-                    full_crop_path = os.path.join(ROOT_DIR, r["crop_image"])
-                    st.image(full_crop_path, caption="📍 Xe vi phạm", use_container_width=True)
-                with cols[1]:
-                    full_context_path = os.path.join(ROOT_DIR, r["context_image"])
-                    st.image(full_context_path, caption="📷 Toàn cảnh", use_container_width=True)
-
-            st.markdown("---")
-            st.download_button(
-                label="📥 Tải JSON",
-                data=json.dumps(valid_records, indent=4, ensure_ascii=False),
-                file_name="violations.json",
-                mime="application/json"
+        # Xuất JSON theo bộ lọc, chỉ khi người dùng yêu cầu: ghi từng bản ghi ra file tạm riêng
+        # của session (2 session không ghi đè bản xuất của nhau, không giữ cả file trong RAM)
+        if "export_path" not in st.session_state:
+            st.session_state["export_path"] = os.path.join(
+                tempfile.gettempdir(), f"violations_export_{uuid.uuid4().hex}.json"
             )
+        export_path = st.session_state["export_path"]
+
+        if st.button("📦 Chuẩn bị file JSON (theo bộ lọc)"):
+            count = export_violation_records(export_path, **filters)
+            st.session_state["history_export"] = (filter_key, count)
+
+        export = st.session_state.get("history_export")
+        if export and export[0] == filter_key and os.path.exists(export_path):
+            with open(export_path, "rb") as f:
+                st.download_button(
+                    label=f"📥 Tải JSON ({export[1]} vi phạm)",
+                    data=f,
+                    file_name="violations.json",
+                    mime="application/json"
+                )
@@ -0,0 +1,290 @@
+import cv2
+import os
+import logging
+import queue
+import time
+from collections import Counter
+
+from core.license_plate_recognition import OCR_ACCEPT_CONF
+from core.plate_ocr_pool import OCR_WORKERS, OCR_QUEUE_SIZE
+from core.model_registry import registry
+from utils.data_logger import flush_violation_log
+from utils.evidence_writer import EvidenceWriter, EVIDENCE_FORMAT, EVIDENCE_QUALITY
+from utils.video_output import AnnotatedVideoWriter, OUTPUT_MODE, OUTPUT_EVERY_N, EVENT_PRE_FRAMES
+from utils.realtime import REALTIME_LATENCY_BUDGET, MAX_FRAME_SKIP
+from utils.profiling import StageTimer, INSTRUMENT
+from utils.frame_source import FrameSource, FrameReader, source_name
+from utils.camera_config import get_config_service, validate_zone
+from app.process_video import (
+    BATCH_MAX_WAIT, MOTION_GATE, ROI_CROP, ROI_CROP_MARGIN, DETECT_WIDTH,
+    PIPELINE_MODELS, StreamProcessor, base_settings, detect_vehicles_gated,
+    output_video_path, dispatch_ocr_results, build_ocr_pool
+)
+
+# =========================
+# ⚙️ CONFIG
+# =========================
+MULTI_BATCH_SIZE = 8        # Batch YOLO gom frame từ nhiều camera
+STREAM_QUEUE_SIZE = 4       # Queue đọc frame / camera
+
+
+# =========================
+# 🎛️ 1 CAMERA TRONG ORCHESTRATOR
+# =========================
+class _Stream:
+    def __init__(self, name, source, reader, processor, out, output_path, realtime):
+        self.name = name
+        self.source = source
+        self.realtime = realtime
+        self.reader = reader
+        self.processor = processor
+        self.out = out
+        self.output_path = output_path
+        self.skipper = processor.frame_skipper
+
+        self.finished = False
+        self.frame_count = 0
+        self.last_taken = 0
+        self.skip_dropped = 0
+        self.processed = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    def next_frame(self):
+        """Lấy 1 frame cần xử lý (đã áp frame skip) hoặc None nếu chưa có"""
+        processor = self.processor
+        while True:
+            try:
+                item = self.reader.queue.get_nowait()
+            except queue.Empty:
+                return None
+
+            if item is None:
+                self.finished = True
+                self.finished_at = time.monotonic()
+                return None
+
+            self.frame_count, frame, t_capture = item
+            # Ranh giới frame: áp config camera vừa sửa (ROI, stop line, knob)
+            processor.sync_config()
+
+            if self.frame_count - self.last_taken >= processor.frame_skip():
+                self.last_taken = self.frame_count
+                return self.frame_count, frame, t_capture
+            self.skip_dropped += 1
+
+    def stats(self):
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return {
+            "total_frames": self.frame_count,
+            "violations": self.processor.violations(),
+            "output_path": self.output_path,
+            "processed_frames": self.processed,
+            "processing_fps": round(self.processed / elapsed, 2) if elapsed > 0 else None,
+            "dropped_frames": {
+                "reader": self.reader.dropped,
+                "skip": self.skip_dropped
+            },
+            "source": self.source.stats(),
+            "frame_skip": dict(self.skipper.stats(), realtime=self.realtime),
+            "camera_config": self.processor.config_stats(),
+            "light_scheduler": self.processor.light_scheduler.stats(),
+            "motion_gate": self.processor.motion_gate_stats(),
+            "video_output": self.out.stats() if self.out is not None else None
+        }
+
+
+def _stream_names(sources):
+    """Tên luồng = tên file / "name" trong config, thêm hậu tố nếu trùng"""
+    names, seen = [], Counter()
+    for src in sources:
+        name = src.get("name") or source_name(src["source"])
+        seen[name] += 1
+        if seen[name] > 1:
+            stem, ext = os.path.splitext(name)
+            name = f"{stem}_{seen[name]}{ext}"
+        names.append(name)
+    return names
+
+
+# =========================
+# 🎥 MULTI-CAMERA
+# =========================
+def process_streams(sources, display=False, frame_callback=None, save_output=True, stop_flag=None,
+                    batch_size=MULTI_BATCH_SIZE, batch_wait=BATCH_MAX_WAIT,
+                    ocr_workers=OCR_WORKERS, ocr_queue_size=OCR_QUEUE_SIZE,
+                    ocr_accept_conf=OCR_ACCEPT_CONF,
+                    evidence_format=EVIDENCE_FORMAT, evidence_quality=EVIDENCE_QUALITY,
+                    output_mode=OUTPUT_MODE, output_width=None, output_every_n=OUTPUT_EVERY_N,
+                    output_pre_frames=EVENT_PRE_FRAMES,
+                    realtime=False, latency_budget=REALTIME_LATENCY_BUDGET, max_frame_skip=MAX_FRAME_SKIP,
+                    motion_gate=MOTION_GATE, roi_crop=ROI_CROP, roi_margin=ROI_CROP_MARGIN,
+                    detect_width=DETECT_WIDTH, instrument=INSTRUMENT, event_index=None, config=None):
+    """
+    Xử lý nhiều camera / video trong 1 process, dùng chung 1 bộ model.
+    sources: list path hoặc dict {"source", "name"?, "mode"?, "roi"?, "stop_line_y" / "stop_line"?, "lanes"?,
+    "settings"?} (mode: "file" | "live" | "replay", mặc định tự nhận theo source).
+    (thiếu ROI → lấy từ config (CameraConfigService, mặc định config/video_zones.json) như process_video,
+    sửa file trong lúc chạy → áp từ frame tiếp theo; ROI khai báo trực tiếp thì cố định).
+    Frame của các luồng được gom round-robin vào cùng 1 batch YOLO.
+    frame_callback(name, frame) nếu có.
+    """
+    sources = [src if isinstance(src, dict) else {"source": src} for src in sources]
+    names = _stream_names(sources)
+    config = config or get_config_service()
+    settings = base_settings(max_frame_skip, latency_budget, motion_gate, roi_crop, roi_margin, detect_width)
+
+    # Thiếu model → lỗi trước khi mở luồng / tạo thread
+    registry.load(PIPELINE_MODELS)
+
+    # Timer dùng chung: stage gộp cho mọi luồng
+    timer = StageTimer(enabled=instrument)
+    ocr_pool, ocr_cache, plate_votes, ocr_stats = build_ocr_pool(
+        ocr_workers, ocr_queue_size, ocr_accept_conf, timer=timer
+    )
+    evidence_writer = EvidenceWriter(image_format=evidence_format, quality=evidence_quality, timer=timer)
+
+    streams = []
+    batch_sizes = Counter()
+    started_at = time.monotonic()
+
+    try:
+        # ===================
+        # MỞ CÁC LUỒNG
+        # ===================
+        for name, src in zip(names, sources):
+            source = FrameSource(src["source"], mode=src.get("mode"))
+            if not source.is_opened():
+                logging.error(f"❌ Không thể mở luồng: {src['source']}")
+                continue
+
+            frame_width, frame_height = source.frame_size
+            fps = source.fps
+
+            if "roi" in src and ("stop_line_y" in src or "stop_line" in src):
+                zone, stream_config = validate_zone(src), None
+            else:
+                zone, stream_config = config.get(source.name, (frame_width, frame_height)), config
+
+            out, output_path = None, None
+            if save_output:
+                output_path = output_video_path(name)
+                out = AnnotatedVideoWriter(
+                    output_path, fps, (frame_width, frame_height),
+                    mode=output_mode, output_width=output_width, every_n=output_every_n,
+                    pre_frames=output_pre_frames, timer=timer
+                )
+
+            # Camera / replay luôn realtime (chỉ xử lý frame mới nhất)
+            stream_realtime = realtime or source.live
+            processor = StreamProcessor(
+                name, (frame_width, frame_height), zone,
+                ocr_pool, ocr_cache, plate_votes, evidence_writer,
+                out=out, display=display,
+                frame_callback=(lambda frame, name=name: frame_callback(name, frame)) if frame_callback else None,
+                settings=settings, realtime=stream_realtime, config=stream_config, config_name=source.name,
+                timer=timer, event_index=event_index
+            )
+            reader = FrameReader(source, STREAM_QUEUE_SIZE, realtime=stream_realtime, stop_flag=stop_flag,
+                                 timer=timer).start()
+            streams.append(_Stream(name, source, reader, processor, out, output_path, stream_realtime))
+            logging.info(f"🎞️ Start: {name}")
+
+        if not streams:
+            return None
+
+        processors = {s.name: s.processor for s in streams}
+        rr = 0  # luồng bắt đầu của batch → luân phiên để không luồng nào bị ưu tiên
+
+        # ===================
+        # 🔁 MAIN LOOP
+        # ===================
+        stopped = False
+        while not stopped:
+
+            if stop_flag and stop_flag.is_set():
+                break
+
+            active = [s for s in streams if not s.finished]
+            if not active:
+                break
+
+            # --- Gom batch round-robin: mỗi vòng lấy tối đa 1 frame / luồng ---
+            batch = []
+            deadline = time.monotonic() + batch_wait
+            rr = (rr + 1) % len(active)
+            order = active[rr:] + active[:rr]
+            while len(batch) < batch_size:
+                got = False
+                for s in order:
+                    if len(batch) >= batch_size:
+                        break
+                    if s.finished:
+                        continue
+                    taken = s.next_frame()
+                    if taken is not None:
+                        frame_idx, frame, t_capture = taken
+                        batch.append((s, frame_idx, frame, t_capture) + s.processor.prepare(frame))
+                        got = True
+                if not got:
+                    if time.monotonic() >= deadline or all(s.finished for s in order):
+                        break
+                    time.sleep(0.002)
+
+            if not batch:
+                continue
+
+            # ======================
+            # 🚗 VEHICLE DETECTION (BATCH nhiều camera)
+            # ======================
+            batch_detections, n_detected = detect_vehicles_gated(
+                [b[5] for b in batch], [b[8] for b in batch], timer
+            )
+            if n_detected:
+                batch_sizes[n_detected] += 1
+
+            for (s, frame_idx, frame, t_capture, resized, _, scale, offset, _), detections in zip(batch, batch_detections):
+                if stop_flag and stop_flag.is_set():
+                    stopped = True
+                    break
+                dispatch_ocr_results(ocr_pool, processors)
+                with timer.stage("frame_total"):
+                    ok = s.processor.process_frame(frame_idx, frame, resized, scale, detections, offset, t_capture)
+                if not ok:
+                    stopped = True
+                    break
+                s.processed += 1
+                s.skipper.observe(time.monotonic() - t_capture)
+
+        # Chờ OCR còn dở để patch các vi phạm chưa có biển, rồi chốt các track còn lại
+        ocr_pool.close()
+        dispatch_ocr_results(ocr_pool, processors)
+        for processor in processors.values():
+            processor.finalize_plates()
+
+    finally:
+        for s in streams:
+            s.source.release()
+            if s.out is not None:
+                s.out.close()
+        ocr_pool.close(timeout=0)
+        evidence_writer.close()
+        flush_violation_log()
+        if display:
+            cv2.destroyAllWindows()
+
+    elapsed = time.monotonic() - started_at
+    total_processed = sum(s.processed for s in streams)
+
+    return {
+        "streams": {s.name: s.stats() for s in streams},
+        "processed_frames": total_processed,
+        "processing_fps": round(total_processed / elapsed, 2) if elapsed > 0 else None,
+        "batch_sizes": dict(sorted(batch_sizes.items())),
+        "ocr_pool": ocr_pool.stats(),
+        "ocr_cache": ocr_cache.stats(),
+        "ocr_engines": ocr_stats.summary(),
+        "models": registry.info(),
+        "evidence": evidence_writer.stats(),
+        "stages": timer.summary()
+    }
@@ -1,23 +1,41 @@
 import cv2
 import os
-import json
 import numpy as np
-import threading
 import queue
 import logging
+import time
+import uuid
+from collections import Counter
+from functools import partial
 from datetime import datetime
 
-from core.vehicle_detection import detect_vehicles
-from core.traffic_light_detection import detect_traffic_light
-from core.license_plate_recognition import detect_and_read_plate
-from utils.data_logger import save_violation_record
+from core.vehicle_detection import detect_vehicles_batch
+from core.traffic_light_detection import TrafficLightScheduler, LIGHT_CHANGE_THRESHOLD, LIGHT_MAX_STALE_FRAMES
+from core.license_plate_recognition import (
+    detect_plate_regions_batch, read_plate, extract_province,
+    PlateVoteStore, OCREngineStats, OCR_ACCEPT_CONF
+)
+from core.plate_cache import PlateOCRCache
+from core.plate_ocr_pool import PlateOCRPool, OCR_WORKERS, OCR_QUEUE_SIZE
+from core.tracker import VehicleTracker, MATCH_DISTANCE, TRACK_TTL, PLATE_RETRY
+from core.motion_gate import (
+    MotionGate, MOTION_GATE_WIDTH, MOTION_PIXEL_DIFF, MOTION_MIN_RATIO, MOTION_HANGOVER
+)
+from core.zones import ZoneEngine
+from core.model_registry import registry, ModelLoadError
+from utils.data_logger import save_violation_record, update_violation_record, flush_violation_log
+from utils.evidence_writer import EvidenceWriter, EVIDENCE_FORMAT, EVIDENCE_QUALITY
+from utils.video_output import AnnotatedVideoWriter, OUTPUT_MODE, OUTPUT_EVERY_N, EVENT_PRE_FRAMES
+from utils.realtime import AdaptiveFrameSkip, REALTIME_LATENCY_BUDGET, MAX_FRAME_SKIP
+from utils.profiling import StageTimer, RunProfiler, null_timer, INSTRUMENT, PROFILE_MODE
+from utils.frame_source import FrameSource, FrameReader, capture_datetime
+from utils.camera_config import get_config_service
 
 # =========================
 # ⚙️ CONFIG
 # =========================
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 OUTPUT_DIR = os.path.join(PROJECT_ROOT, "output", "violations")
-CONFIG_PATH = os.path.join(PROJECT_ROOT, "config", "video_zones.json")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 logging.basicConfig(
@@ -26,92 +44,699 @@ logging.basicConfig(
     datefmt="%H:%M:%S"
 )
 
-CAMERA_DIRECTION_UP = True
-FRAME_SKIP = 1
+# Mặc định cho mọi camera – ghi đè từng camera bằng "settings" trong video_zones.json (base_settings)
+CAMERA_DIRECTION_UP = True   # Hướng mặc định (khi video_zones.json không khai báo làn)
+FRAME_SKIP = 1          # Skip cố định (realtime=True thì đây là mức tối thiểu)
 RESIZE_WIDTH = 640
+BATCH_SIZE = 4          # Số frame gom lại cho 1 lần inference YOLO
+BATCH_MAX_WAIT = 0.05   # Thời gian chờ tối đa (giây) để gom đủ batch
+MOTION_GATE = True      # Bỏ qua detect xe khi ROI đứng yên và không còn track
+TTL_CHECK_INTERVAL = 30 # Kiểm tra TTL track mỗi 30 frame (theo frame gốc)
+ROI_CROP = False        # Cắt frame theo bounding rect của ROI trước khi resize cho YOLO xe
+ROI_CROP_MARGIN = 0.1   # Lề thêm quanh ROI (tỉ lệ theo kích thước bounding rect)
+DETECT_WIDTH = RESIZE_WIDTH  # Chiều rộng ảnh đưa vào YOLO xe (có thể giảm khi dùng ROI_CROP)
+PLATE_PENDING = "Pending"   # Biển số của vi phạm ghi khi OCR còn chạy (được patch khi có kết quả)
+# Model pipeline cần – load trước vòng lặp: thiếu thư viện / weights → lỗi ngay, không chạy "0 vi phạm"
+PIPELINE_MODELS = ("vehicle", "traffic_light", "lp_detector", "lp_ocr", "paddle_ocr")
 
 
 # =========================
-# 📐 DEFAULT ROI
+# 🎛️ KNOB THEO CAMERA
 # =========================
-def get_dynamic_roi(frame_width, frame_height):
-    top_y = int(frame_height * 0.15)
-    bottom_y = int(frame_height * 0.80)
-    left_x = int(frame_width * 0.10)
-    right_x = int(frame_width * 0.90)
-    return np.array([
-        (left_x, top_y),
-        (right_x, top_y),
-        (right_x, bottom_y),
-        (left_x, bottom_y)
-    ])
+def base_settings(max_frame_skip=MAX_FRAME_SKIP, latency_budget=REALTIME_LATENCY_BUDGET,
+                  motion_gate=MOTION_GATE, roi_crop=ROI_CROP, roi_margin=ROI_CROP_MARGIN,
+                  detect_width=DETECT_WIDTH):
+    """Giá trị mặc định của các knob theo camera (hằng số + tham số process_video),
+    bị ghi đè bởi "settings" của camera trong video_zones.json"""
+    return {
+        "direction": "up" if CAMERA_DIRECTION_UP else "down",
+        "frame_skip": FRAME_SKIP,
+        "max_frame_skip": max_frame_skip,
+        "latency_budget": latency_budget,
+        "resize_width": RESIZE_WIDTH,
+        "detect_width": detect_width,
+        "roi_crop": roi_crop,
+        "roi_margin": roi_margin,
+        "motion_gate": motion_gate,
+        "track_ttl": TRACK_TTL,
+        "match_distance": MATCH_DISTANCE,
+        "plate_retry": PLATE_RETRY,
+        "ttl_check_interval": TTL_CHECK_INTERVAL,
+        "light_change_threshold": LIGHT_CHANGE_THRESHOLD,
+        "light_max_stale_frames": LIGHT_MAX_STALE_FRAMES,
+        "motion_gate_width": MOTION_GATE_WIDTH,
+        "motion_pixel_diff": MOTION_PIXEL_DIFF,
+        "motion_min_ratio": MOTION_MIN_RATIO,
+        "motion_hangover": MOTION_HANGOVER
+    }
 
 
 # =========================
 # UTILITIES
 # =========================
-def is_in_roi(box, roi_polygon):
-    x1, y1, x2, y2 = box
-    cx, cy = (x1 + x2)//2, (y1 + y2)//2
-    return cv2.pointPolygonTest(roi_polygon, (cx, cy), False) >= 0
+def build_zone_engine(zone, frame_width, frame_height, direction=None):
+    if direction is None:
+        direction = "up" if CAMERA_DIRECTION_UP else "down"
+    return ZoneEngine.from_config(zone, (frame_width, frame_height), default_direction=direction)
+
+
+def resize_for_detection(frame, width=RESIZE_WIDTH):
+    """Resize frame về width cho YOLO, trả về (resized, scale)"""
+    h, w = frame.shape[:2]
+    scale = width / w
+    return cv2.resize(frame, (width, int(h * scale))), scale
+
+
+def roi_crop_rect(roi_polygon, frame_size, margin=ROI_CROP_MARGIN):
+    """Bounding rect (x1, y1, x2, y2) của ROI + lề, giới hạn trong frame"""
+    frame_width, frame_height = frame_size
+    x, y, w, h = cv2.boundingRect(np.asarray(roi_polygon, dtype=np.int32))
+    mx, my = int(w * margin), int(h * margin)
+    return (
+        max(0, x - mx),
+        max(0, y - my),
+        min(frame_width, x + w + mx),
+        min(frame_height, y + h + my)
+    )
 
 
-def get_distance(p1, p2):
-    return ((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2) ** 0.5
+def detect_vehicles_gated(resized_frames, detect_flags, timer=None):
+    """YOLO batch chỉ cho các frame qua motion gate; frame bị gate → None"""
+    picked = [f for f, flag in zip(resized_frames, detect_flags) if flag]
+    try:
+        with (timer or null_timer()).stage("vehicle_detection"):
+            detections = iter(detect_vehicles_batch(picked) if picked else [])
+    except ModelLoadError:
+        raise
+    except Exception:
+        detections = iter([[] for _ in picked])
+    return [next(detections) if flag else None for flag in detect_flags], len(picked)
+
+
+def profile_output_path(video_name):
+    return os.path.join(
+        OUTPUT_DIR, "profiles",
+        f"{os.path.splitext(video_name)[0]}_{datetime.now():%Y%m%d_%H%M%S}.prof"
+    )
 
 
+def output_video_path(video_name):
+    return os.path.join(
+        OUTPUT_DIR,
+        f"{os.path.splitext(video_name)[0]}_{datetime.now():%Y%m%d_%H%M%S}.mp4"
+    )
+
 
 # =========================
-# 🎥 MAIN PROCESS
+# 🚦 XỬ LÝ 1 LUỒNG VIDEO
 # =========================
-def process_video(video_path, display=False, frame_callback=None, save_output=True, stop_flag=None):
+class StreamProcessor:
+    """
+    Trạng thái riêng của 1 luồng (tracker, đèn, ROI, video kết quả) + logic xử lý từng frame.
+    OCR pool / cache / vote / evidence writer dùng chung giữa các luồng:
+    key OCR là (stream_name, track_id) để không lẫn track giữa các camera.
+    """
+
+    def __init__(self, video_name, frame_size, zone,
+                 ocr_pool, ocr_cache, plate_votes, evidence_writer,
+                 out=None, display=False, frame_callback=None, settings=None, realtime=False,
+                 config=None, config_name=None, timer=None, event_index=None):
+        """
+        zone: entry video_zones.json của camera (ROI, stop line, làn, "settings" riêng).
+        settings: knob mặc định (base_settings) – "settings" của camera ghi đè từng knob.
+        config: CameraConfigService → entry config_name đổi trên đĩa thì áp lại ở ranh giới frame.
+        """
+        self.video_name = video_name
+        self.frame_width, self.frame_height = frame_size
+
+        self.ocr_pool = ocr_pool
+        self.ocr_cache = ocr_cache
+        self.plate_votes = plate_votes
+        self.evidence_writer = evidence_writer
+
+        self.out = out
+        self.display = display
+        self.frame_callback = frame_callback
+        self.timer = timer or null_timer()
+        self.event_index = event_index      # ViolationIndex cho GUI (tùy chọn)
+
+        self.tracker = VehicleTracker()
+        self.tracks = self.tracker.tracks
+        self._violated_ids = []     # track_id đã vi phạm (giữ lại cả khi track hết TTL)
+        self._captured_at = None    # giờ capture của frame đang xử lý
+
+        # Light smoothing (model đèn chỉ chạy khi ROI thay đổi)
+        self.light_scheduler = TrafficLightScheduler()
+        self.stable_light = None
+        self.same_light_counter = 0
+        self._last_ttl_check = 0
+
+        # ROI / làn / motion gate / crop / frame skip dựng trong apply_config
+        self.realtime = realtime
+        self.base_settings = dict(base_settings() if settings is None else settings)
+        self.settings = {}
+        self.zone = None
+        self.motion_gate = None
+        self.frame_skipper = None
+
+        self.config = config
+        self.config_name = config_name or video_name
+        self._config_version = config.version(self.config_name) if config is not None else None
+        self.config_reloads = 0
+        self.apply_config(zone)
+
+    def _key(self, track_id):
+        return (self.video_name, track_id)
+
+    # ===================
+    # 🔤 OCR NỀN → MERGE VÀO TRACK
+    # ===================
+    def apply_plate_result(self, track_id, result):
+        tr = self.tracks.get(track_id)
+        if tr is None:
+            # Track đã hết TTL khi OCR còn chạy: job vừa ghi lại vote / cache sau lần discard → xóa lại
+            self.ocr_cache.discard(self._key(track_id))
+            self.plate_votes.discard(self._key(track_id))
+            return
+        tr["plate_pending"] = False
+        if tr["plate"] is not None:
+            return
+
+        detected_plate = result.get("plate", "Unknown")
+        detected_province = result.get("province", "Unknown")
+
+        # Voting đã hội tụ → chốt biển, dừng OCR cho track này
+        if result.get("converged"):
+            tr["plate"] = detected_plate
+            tr["province"] = detected_province
+        else:
+            # Chưa rõ → giảm retry
+            tr["plate_retry"] -= 1
+            # Hết retry → lấy kết quả vote tốt nhất (hoặc Unknown)
+            if tr["plate_retry"] <= 0:
+                leader, _ = self.plate_votes.result(self._key(track_id))
+                tr["plate"] = leader
+                tr["province"] = extract_province(leader)
+
+        # Vi phạm đã ghi trước khi có biển → patch lại record
+        if tr["plate"] is not None:
+            self._patch_plate(tr)
+
+    def _patch_plate(self, tr):
+        if not tr.get("record_id"):
+            return
+        patch = {"license_plate": tr["plate"], "province": tr["province"]}
+        update_violation_record(tr["record_id"], patch)
+        if self.event_index is not None:
+            self.event_index.update(tr["record_id"], patch)
+
+    def finalize_plate(self, track_id, tr):
+        """
+        Track kết thúc (hết TTL / hết video) khi biển chưa chốt: lấy kết quả vote hiện có
+        (hoặc Unknown) để record vi phạm không kẹt ở PLATE_PENDING. Gọi trước khi xóa vote.
+        """
+        if tr["plate"] is not None:
+            return
+        leader, _ = self.plate_votes.result(self._key(track_id))
+        tr["plate"] = leader
+        tr["province"] = extract_province(leader)
+        self._patch_plate(tr)
+
+    def finalize_plates(self):
+        """Cuối lần chạy (sau khi merge OCR nền lần cuối): chốt biển cho mọi track còn sống"""
+        for track_id, tr in self.tracks.items():
+            self.finalize_plate(track_id, tr)
+
+    # ===================
+    # 🎛️ CONFIG CAMERA (ÁP Ở RANH GIỚI FRAME)
+    # ===================
+    def apply_config(self, zone):
+        """Dựng lại ROI / stop line / làn + áp knob của camera, giữ nguyên track đang theo dõi"""
+        settings = dict(self.base_settings, **zone.get("settings", {}))
+        frame_size = (self.frame_width, self.frame_height)
+        roi_changed = self.zone is None or zone["roi"] != self.zone["roi"]
+        width_changed = settings["motion_gate_width"] != self.settings.get("motion_gate_width")
+
+        self.zones = build_zone_engine(zone, self.frame_width, self.frame_height, settings["direction"])
+
+        tracker = self.tracker
+        tracker.max_distance = settings["match_distance"]
+        tracker.ttl = settings["track_ttl"]
+        tracker.plate_retry = settings["plate_retry"]
+
+        # Ngưỡng chạy lại model đèn (theo cảnh của từng camera)
+        self.light_scheduler.threshold = settings["light_change_threshold"]
+        self.light_scheduler.max_stale_frames = settings["light_max_stale_frames"]
+
+        # Motion gate trong ROI (độ phân giải thấp) – dựng lại khi ROI / độ phân giải đổi, giữ thống kê
+        old_gate = self.motion_gate
+        if not settings["motion_gate"]:
+            self.motion_gate = None
+        elif old_gate is None or roi_changed or width_changed:
+            self.motion_gate = MotionGate(
+                self.zones.roi, frame_size, width=settings["motion_gate_width"],
+                pixel_diff=settings["motion_pixel_diff"], min_ratio=settings["motion_min_ratio"],
+                hangover=settings["motion_hangover"]
+            )
+            if old_gate is not None:
+                self.motion_gate.checked, self.motion_gate.gated = old_gate.checked, old_gate.gated
+        elif self.motion_gate is not None:
+            self.motion_gate.pixel_diff = settings["motion_pixel_diff"]
+            self.motion_gate.min_ratio = settings["motion_min_ratio"]
+            self.motion_gate.hangover = settings["motion_hangover"]
+
+        # Input YOLO xe: cả frame hoặc chỉ vùng quanh ROI
+        self.crop_rect = (
+            roi_crop_rect(self.zones.roi, frame_size, settings["roi_margin"]) if settings["roi_crop"] else None
+        )
+        self.resize_width = settings["resize_width"]
+        self.detect_width = settings["detect_width"]
+        self.ttl_check_interval = settings["ttl_check_interval"]
+
+        # Frame skip: realtime → tự tăng/giảm theo độ trễ đo được
+        max_skip = settings["max_frame_skip"] if self.realtime else settings["frame_skip"]
+        if self.frame_skipper is None:
+            self.frame_skipper = AdaptiveFrameSkip(
+                budget=settings["latency_budget"], base_skip=settings["frame_skip"], max_skip=max_skip
+            )
+        else:
+            self.frame_skipper.configure(settings["latency_budget"], settings["frame_skip"], max_skip)
+
+        self.zone = zone
+        self.settings = settings
+
+    def sync_config(self):
+        """Gọi trước mỗi frame: entry của camera đổi trên đĩa → áp config mới. True nếu đã áp"""
+        config = self.config
+        if config is None:
+            return False
+        config.poll()
+        version = config.version(self.config_name)
+        if version == self._config_version:
+            return False
+        self._config_version = version
+        zone = config.get(self.config_name)
+        if zone is None:
+            return False
+        try:
+            self.apply_config(zone)
+        except ValueError as e:
+            logging.error(f"❌ [{self.video_name}] Không áp được config mới, giữ config cũ: {e}")
+            return False
+        self.config_reloads += 1
+        logging.info(f"🔄 [{self.video_name}] Đã áp config mới (v{version})")
+        return True
+
+    def frame_skip(self):
+        """Skip cho frame tiếp theo. Realtime: giới hạn theo tốc độ xe để tracker vẫn match được"""
+        if self.realtime:
+            return self.frame_skipper.effective_skip(self.tracker.speed, self.tracker.max_distance)
+        return self.frame_skipper.base_skip
+
+    def needs_detection(self, resized):
+        """Motion gate: False → frame này bỏ qua detect xe + đèn"""
+        if self.motion_gate is None:
+            return True
+        return self.motion_gate.should_detect(resized, live_tracks=bool(self.tracks))
+
+    def prepare(self, frame):
+        """
+        → (resized, det_input, scale, offset, detect)
+        resized: cả frame ở resize_width (đèn + motion gate),
+        det_input: ảnh cho YOLO xe; box gốc = box / scale + offset
+        """
+        with self.timer.stage("resize"):
+            resized, scale = resize_for_detection(frame, self.resize_width)
+
+        with self.timer.stage("motion_gate"):
+            detect = self.needs_detection(resized)
+
+        if self.crop_rect is None and self.detect_width == self.resize_width:
+            return resized, resized, scale, (0, 0), detect
+
+        with self.timer.stage("roi_crop"):
+            h, w = frame.shape[:2]
+            x1, y1, x2, y2 = self.crop_rect or (0, 0, w, h)
+            det_scale = self.detect_width / (x2 - x1)
+            det_input = cv2.resize(
+                frame[y1:y2, x1:x2],
+                (self.detect_width, max(1, int((y2 - y1) * det_scale)))
+            )
+        return resized, det_input, det_scale, (x1, y1), detect
+
+    # ===================
+    # 🖼️ XỬ LÝ 1 FRAME
+    # ===================
+    def process_frame(self, frame_idx, frame, resized, scale, detections, offset=(0, 0), t_capture=None):
+        """
+        Light + tracking + vi phạm cho 1 frame. Trả về False nếu cần dừng.
+        detections=None → frame bị motion gate bỏ qua (vẫn kiểm tra TTL, vẫn vẽ / ghi video).
+        detections theo toạ độ input YOLO: box gốc = box / scale + offset.
+        t_capture: thời điểm đọc frame (time.monotonic) → timestamp vi phạm theo lúc capture.
+        """
+        timer = self.timer
+        out = self.out
+        self._captured_at = capture_datetime(t_capture) if t_capture is not None else None
+
+        # Cleanup old tracks (TTL) – theo khoảng frame gốc, không phụ thuộc frame skip / gate
+        if frame_idx - self._last_ttl_check >= self.ttl_check_interval:
+            self._last_ttl_check = frame_idx
+            self._expire_tracks(frame_idx)
+
+        gated = detections is None
+        if gated:
+            detections = []
+
+        with timer.stage("traffic_light"):
+            light_state = self._update_light(resized, gated)
+
+        # Chỉ vẽ khi frame được hiển thị / gửi GUI / ghi ra video
+        # (callback có wants() – vd PreviewChannel – tự giới hạn FPS preview)
+        callback = self.frame_callback
+        send = callback is not None and (not hasattr(callback, "wants") or callback.wants(frame_idx))
+        draw = self.display or send or (out is not None and out.wants(frame_idx))
+
+        if draw:
+            color = (0,0,255) if light_state=="red" else ((0,255,255) if light_state=="yellow" else (0,255,0))
+            cv2.putText(frame, f"Light: {light_state}", (30,50),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
+
+        with timer.stage("tracking"):
+            boxes, track_ids = self._track(frame_idx, detections, scale, offset)
+
+        with timer.stage("plate_detection"):
+            self._read_plates(frame_idx, frame, boxes, track_ids)
+
+        with timer.stage("violation_check"):
+            self._check_violations(frame_idx, frame, detections, boxes, track_ids, light_state, draw)
+
+        # Draw ROI + làn + stopline
+        if draw:
+            self.zones.draw(frame)
 
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
+        if send:
+            with timer.stage("frame_callback"):
+                callback(frame)
+
+        if out is not None:
+            with timer.stage("video_write"):
+                out.write(frame_idx, frame)
+
+        if self.display:
+            cv2.imshow(f"Traffic - {self.video_name}", frame)
+            if cv2.waitKey(1) == ord("q"):
+                return False
+
+        return True
+
+    def _expire_tracks(self, frame_idx):
+        dead_tracks = self.tracker.expire(frame_idx)
+        for tid, tr in dead_tracks.items():
+            self.finalize_plate(tid, tr)
+            self.ocr_cache.discard(self._key(tid))
+            self.plate_votes.discard(self._key(tid))
+        if dead_tracks:
+            logging.info(f"🧹 [{self.video_name}] Cleaned {len(dead_tracks)} old tracks")
+
+    # ======================
+    # 🚦 TRAFFIC LIGHT
+    # ======================
+    def _update_light(self, resized, gated):
+        if gated:
+            # Không có xe → không cần đèn, giữ trạng thái cũ để hiển thị
+            return self.stable_light or "unknown"
+
+        try:
+            cur = self.light_scheduler.update(resized)
+            if cur == self.stable_light:
+                self.same_light_counter += 1
+            else:
+                self.same_light_counter = 0
+
+            light_state = cur if self.same_light_counter >= 3 else (self.stable_light or cur)
+            self.stable_light = cur
+
+        except ModelLoadError:
+            raise
+        except Exception:
+            light_state = "unknown"
+
+        return light_state
+
+    # ============================================================
+    # TRACKING + DIRECTION
+    # ============================================================
+    def _track(self, frame_idx, detections, scale, offset):
+        # Scale box về size gốc (+ offset nếu input YOLO là vùng cắt quanh ROI)
+        ox, oy = offset
+        boxes = [
+            [int(x1 / scale) + ox, int(y1 / scale) + oy, int(x2 / scale) + ox, int(y2 / scale) + oy]
+            for _, (x1, y1, x2, y2), _ in detections
+        ]
+        track_ids = self.tracker.update(boxes, [label for label, _, _ in detections], frame_idx)
+        return boxes, track_ids
+
+    # =========================================
+    # LICENSE PLATE RECOGNITION (BATCH, WITH RETRY)
+    # =========================================
+    def _read_plates(self, frame_idx, frame, boxes, track_ids):
+        tracks = self.tracks
+        plate_jobs = []
+        for box, track_id in zip(boxes, track_ids):
+            tr = tracks[track_id]
+            # 🚫 SIDE → bỏ qua hoàn toàn
+            if tr["direction"] == "side":
+                continue
+            # Đang chờ OCR nền → không gửi thêm
+            if tr["plate"] is None and tr.get("plate_retry", 0) > 0 and not tr.get("plate_pending"):
+                plate_jobs.append((track_id, box))
+
+        if not plate_jobs:
+            return
+
+        try:
+            lp_crops = detect_plate_regions_batch(frame, plate_jobs)
+        except ModelLoadError:
+            raise
+        except Exception:
+            lp_crops = {}
+
+        for track_id, _ in plate_jobs:
+            lp_crop = lp_crops.get(track_id)
+            if lp_crop is None:
+                # Không thấy biển → tính như 1 lần retry thất bại
+                self.apply_plate_result(track_id, {"plate": "Unknown", "province": "Unknown"})
+            elif self.ocr_pool.submit(self._key(track_id), frame_idx, lp_crop):
+                tracks[track_id]["plate_pending"] = True
+
+    # ============================================================
+    # STOPLINE VIOLATION LOGIC (FIX SIDE)
+    # ============================================================
+    def _check_violations(self, frame_idx, frame, detections, boxes, track_ids, light_state, draw):
+        tracks = self.tracks
+        out = self.out
+
+        # ROI / làn / vượt vạch cho mọi detection trong 1 lần (vectorized)
+        zone_info = self.zones.classify(boxes) if boxes else None
+
+        for i, ((label, _, conf), (x1, y1, x2, y2), track_id) in enumerate(zip(detections, boxes, track_ids)):
+
+            tr = tracks[track_id]
+
+            # 🚫 SIDE → bỏ qua hoàn toàn
+            if tr["direction"] == "side":
+                continue
+
+            plate = tr.get("plate") or PLATE_PENDING
+            province = tr.get("province") or "Unknown"
+
+            # ROI ENTER
+            if zone_info["in_roi"][i]:
+                tr["entered"] = True
+
+            violated_now = False
+
+            if light_state == "red" and tr["entered"]:
+                # Đúng hướng của làn + qua vạch quá tolerance
+                if tr["direction"] == zone_info["direction"][i] and zone_info["past"][i]:
+                    violated_now = True
+
+                if zone_info["crossed"][i]:
+                    tr["crossed"] = True
+
+            # SAVE VIOLATION
+            if violated_now and not tr["violated"]:
+                tr["violated"] = True
+                self._violated_ids.append(track_id)
+
+                captured_at = self._captured_at or datetime.now()
+                ts = captured_at.strftime("%H%M%S")
+                folder = os.path.join(OUTPUT_DIR, os.path.splitext(self.video_name)[0])
+                crop_path, context_path = self.evidence_writer.paths(folder, f"{track_id}_{ts}")
+
+                tr["record_id"] = uuid.uuid4().hex
+                has_evidence = x2 > x1 and y2 > y1
+                record = {
+                    "record_id": tr["record_id"],
+                    "video": self.video_name,
+                    "track_id": track_id,
+                    "vehicle_type": tr["label"],
+                    "license_plate": plate,
+                    "province": province,
+                    "lane": self.zones.lane_name(int(zone_info["lane"][i])),
+                    "timestamp": captured_at.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "frame_idx": frame_idx,
+                    # ========= RELATIVE PATH =========
+                    "crop_image": os.path.relpath(crop_path, PROJECT_ROOT) if has_evidence else None,
+                    "context_image": os.path.relpath(context_path, PROJECT_ROOT) if has_evidence else None
+                }
+                # Publish trước khi giao ảnh: callback "ảnh đã ghi" luôn tìm thấy sự kiện
+                if self.event_index is not None:
+                    self.event_index.publish(record)
+
+                if has_evidence:
+                    # Encode + vẽ context + ghi đĩa chạy nền (frame còn bị vẽ tiếp → giao bản copy)
+                    with self.timer.stage("evidence_submit"):
+                        evidence_frame = frame.copy() if draw else frame
+                        self.evidence_writer.submit(evidence_frame, (x1, y1, x2, y2), crop_path, context_path,
+                                                    on_done=self._evidence_done(tr["record_id"]))
+
+                save_violation_record(record)
+
+                if out is not None:
+                    out.mark_event(frame_idx)
+
+            # DRAW BOX
+            if draw:
+                color = (0,0,255) if tr["violated"] else (0,255,0)
+                cv2.rectangle(frame, (x1,y1), (x2,y2), color, 2)
+                cv2.putText(
+                    frame,
+                    f"{label} | {plate}",
+                    (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                    color, 2
+                )
+
+    def _evidence_done(self, record_id):
+        """Callback EvidenceWriter: báo GUI ảnh bằng chứng đã ghi xong"""
+        if self.event_index is None:
+            return None
+        return lambda ok: self.event_index.update(record_id, {"evidence_ready": ok})
+
+    def violations(self):
+        return list(self._violated_ids)
+
+    def config_stats(self):
+        return {"settings": dict(self.settings), "version": self._config_version, "reloads": self.config_reloads}
+
+    def motion_gate_stats(self):
+        return self.motion_gate.stats() if self.motion_gate is not None else None
+
+
+def dispatch_ocr_results(ocr_pool, processors):
+    """Merge kết quả OCR nền vào đúng luồng: processors = {video_name: StreamProcessor}"""
+    for (stream_name, track_id), _, result in ocr_pool.drain():
+        processor = processors.get(stream_name)
+        if processor is not None:
+            processor.apply_plate_result(track_id, result)
+
+
+def build_ocr_pool(ocr_workers, ocr_queue_size, ocr_accept_conf, timer=None):
+    """OCR biển số chạy nền (dùng chung cho mọi luồng): (pool, cache, votes, stats)"""
+    ocr_cache = PlateOCRCache()
+    plate_votes = PlateVoteStore()
+    ocr_stats = OCREngineStats()
+    ocr_pool = PlateOCRPool(
+        workers=ocr_workers,
+        max_queue=ocr_queue_size,
+        timer=timer,
+        read_fn=partial(
+            read_plate,
+            cache=ocr_cache,
+            votes=plate_votes,
+            accept_conf=ocr_accept_conf,
+            ocr_stats=ocr_stats
+        )
+    )
+    return ocr_pool, ocr_cache, plate_votes, ocr_stats
+
+
+# =========================
+# 🎥 MAIN PROCESS
+# =========================
+def process_video(video_path, display=False, frame_callback=None, save_output=True, stop_flag=None,
+                  batch_size=BATCH_SIZE, batch_wait=BATCH_MAX_WAIT,
+                  ocr_workers=OCR_WORKERS, ocr_queue_size=OCR_QUEUE_SIZE,
+                  ocr_accept_conf=OCR_ACCEPT_CONF,
+                  evidence_format=EVIDENCE_FORMAT, evidence_quality=EVIDENCE_QUALITY,
+                  output_mode=OUTPUT_MODE, output_width=None, output_every_n=OUTPUT_EVERY_N,
+                  output_pre_frames=EVENT_PRE_FRAMES,
+                  realtime=False, latency_budget=REALTIME_LATENCY_BUDGET, max_frame_skip=MAX_FRAME_SKIP,
+                  motion_gate=MOTION_GATE, roi_crop=ROI_CROP, roi_margin=ROI_CROP_MARGIN,
+                  detect_width=DETECT_WIDTH, instrument=INSTRUMENT, profile=PROFILE_MODE,
+                  event_index=None, source_mode=None, config=None):
+    """
+    source_mode: None (tự nhận: camera / URL → "live", còn lại "file") | "file" | "live" | "replay".
+    Nguồn live / replay: chỉ xử lý frame mới nhất, tự bật realtime (frame skip theo độ trễ).
+    config: CameraConfigService (mặc định: config/video_zones.json) – ROI / stop line / knob của camera
+    sửa trong lúc chạy được áp từ frame tiếp theo.
+    """
+
+    registry.load(PIPELINE_MODELS)
+
+    source = FrameSource(video_path, mode=source_mode)
+    if not source.is_opened():
         logging.error("❌ Không thể mở video.")
         return None
+    realtime = realtime or source.live
+
+    frame_width, frame_height = source.frame_size
+    fps = source.fps
 
-    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = cap.get(cv2.CAP_PROP_FPS) or 25
-
-
-    # Load ROI
-    video_name = os.path.basename(video_path)
-    if os.path.exists(CONFIG_PATH):
-        with open(CONFIG_PATH, "r") as f:
-            zones = json.load(f)
-    else:
-        zones = {}
-
-    if video_name in zones:
-        ROI_POLYGON = np.array(zones[video_name]["roi"], dtype=np.int32)
-        stopline_y = zones[video_name]["stop_line_y"]
-    else:
-        ROI_POLYGON = get_dynamic_roi(frame_width, frame_height)
-        stopline_y = int(frame_height * 0.5)
-        zones[video_name] = {
-            "roi": ROI_POLYGON.tolist(),
-            "stop_line_y": stopline_y
-        }
-        os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
-        with open(CONFIG_PATH, "w") as f:
-            json.dump(zones, f, indent=4)
+
+    # Load ROI + knob của camera (cache trong RAM, tạo mặc định nếu chưa có)
+    video_name = source.name
+    config = config or get_config_service()
+    zone = config.get(video_name, (frame_width, frame_height))
 
 
     logging.info(f"🎞️ Start: {video_name}")
 
-    output_path = os.path.join(
-        OUTPUT_DIR,
-        f"{os.path.splitext(video_name)[0]}_{datetime.now():%Y%m%d_%H%M%S}.mp4"
+    output_path = output_video_path(video_name)
+
+    # Đo thời gian từng bước (tắt → no-op)
+    timer = StageTimer(enabled=instrument)
+
+    # Encode video kết quả trên thread riêng
+    out = None
+    if save_output:
+        out = AnnotatedVideoWriter(
+            output_path, fps, (frame_width, frame_height),
+            mode=output_mode, output_width=output_width, every_n=output_every_n,
+            pre_frames=output_pre_frames, timer=timer
+        )
+
+    # OCR biển số chạy nền, không chặn vòng lặp frame
+    ocr_pool, ocr_cache, plate_votes, ocr_stats = build_ocr_pool(
+        ocr_workers, ocr_queue_size, ocr_accept_conf, timer=timer
     )
 
-    out = cv2.VideoWriter(
-        output_path,
-        cv2.VideoWriter_fourcc(*"mp4v"),
-        fps,
-        (frame_width, frame_height)
+    # Ảnh bằng chứng vi phạm ghi nền
+    evidence_writer = EvidenceWriter(image_format=evidence_format, quality=evidence_quality, timer=timer)
+
+    processor = StreamProcessor(
+        video_name, (frame_width, frame_height), zone,
+        ocr_pool, ocr_cache, plate_votes, evidence_writer,
+        out=out, display=display, frame_callback=frame_callback,
+        settings=base_settings(max_frame_skip, latency_budget, motion_gate, roi_crop, roi_margin, detect_width),
+        realtime=realtime, config=config, timer=timer, event_index=event_index
     )
+    processors = {video_name: processor}
+
+    # cProfile / sampling profiler cho cả lần chạy (tùy chọn)
+    profiler = RunProfiler(profile, profile_output_path(video_name) if profile == "cprofile" else None).start()
+    profile_summary = None
 
     # Đảm bảo release resources
     try:
@@ -119,318 +744,141 @@ def process_video(video_path, display=False, frame_callback=None, save_output=Tr
         # ===================
         # THREAD READ FRAMES
         # ===================
-        frame_queue = queue.Queue(maxsize=5)
-
-        def read_frames():
-            while cap.isOpened():
-                if stop_flag and stop_flag.is_set():
-                    break
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                try:
-                    frame_queue.put(frame, timeout=1)
-                except queue.Full:
-                    # Nếu queue đầy, check stop_flag
-                    if stop_flag and stop_flag.is_set():
-                        break
-                    pass
-            cap.release()
-            frame_queue.put(None)
-
-        threading.Thread(target=read_frames, daemon=True).start()
-
-
-        # ===================
-        # TRACKING DATA
-        # ===================
-        tracks = {}
-        track_id_counter = 0
-        TRACK_TTL = 60  # Xóa track sau 60 frame không thấy
-
-        # Light smoothing
-        stable_light = None
-        same_light_counter = 0
+        reader = FrameReader(source, max(5, 2 * batch_size), realtime=realtime, stop_flag=stop_flag,
+                             timer=timer).start()
+        frame_queue = reader.queue
 
         frame_count = 0
+        batch_sizes = Counter()
+
+        # Frame skip: realtime → tự tăng/giảm theo độ trễ đo được (knob theo camera)
+        frame_skipper = processor.frame_skipper
+        last_taken = 0
+        skip_dropped = 0
+        processed = 0
+        started_at = time.monotonic()
 
 
         # ===================
         # 🔁 MAIN LOOP
         # ===================
-        while True:
+        finished = False
+        while not finished:
 
             if stop_flag and stop_flag.is_set():
                 break
 
             try:
-                frame = frame_queue.get(timeout=1)
+                item = frame_queue.get(timeout=1)
             except queue.Empty:
                 continue
 
-            if frame is None:
-                break
-
-            frame_count += 1
-            if frame_count % FRAME_SKIP != 0:
-                continue
-
-            # Cleanup old tracks (TTL)
-            if frame_count % 30 == 0:  # Check mỗi 30 frame
-                dead_tracks = [tid for tid, t in tracks.items() 
-                              if frame_count - t.get("last_seen", 0) > TRACK_TTL]
-                for tid in dead_tracks:
-                    del tracks[tid]
-                if dead_tracks:
-                    logging.info(f"🧹 Cleaned {len(dead_tracks)} old tracks")
+            # --- Gom batch: tối đa batch_size frame hoặc hết batch_wait giây ---
+            batch = []
+            deadline = time.monotonic() + batch_wait
+            while True:
+                if item is None:
+                    finished = True
+                    break
 
-            # --- Resize for YOLO ---
-            h, w = frame.shape[:2]
-            scale = RESIZE_WIDTH / w
-            resized = cv2.resize(frame, (RESIZE_WIDTH, int(h * scale)))
+                frame_count, frame, t_capture = item
 
-            # Check stop flag trước khi xử lý nặng
-            if stop_flag and stop_flag.is_set():
-                break
+                # Ranh giới frame: áp config camera vừa sửa (ROI, stop line, knob)
+                processor.sync_config()
 
-            # ======================
-            # 🚦 TRAFFIC LIGHT
-            # ======================
-            try:
-                cur = detect_traffic_light(resized)
-                if cur == stable_light:
-                    same_light_counter += 1
+                # Realtime: giới hạn skip theo tốc độ xe để tracker vẫn match được (MATCH_DISTANCE)
+                if frame_count - last_taken >= processor.frame_skip():
+                    last_taken = frame_count
+                    # --- Resize (+ crop ROI) for YOLO, motion gate ---
+                    batch.append((frame_count, frame, t_capture) + processor.prepare(frame))
                 else:
-                    same_light_counter = 0
-
-                light_state = cur if same_light_counter >= 3 else (stable_light or cur)
-                stable_light = cur
+                    skip_dropped += 1
 
-            except:
-                light_state = "unknown"
+                if len(batch) >= batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = frame_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
 
-            color = (0,0,255) if light_state=="red" else ((0,255,255) if light_state=="yellow" else (0,255,0))
-            cv2.putText(frame, f"Light: {light_state}", (30,50),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
+            if not batch:
+                continue
 
             # Check stop flag trước vehicle detection
             if stop_flag and stop_flag.is_set():
                 break
 
             # ======================
-            # 🚗 VEHICLE DETECTION
+            # 🚗 VEHICLE DETECTION (BATCH, bỏ các frame bị motion gate)
             # ======================
-            try:
-                detections = detect_vehicles(resized)
-            except:
-                detections = []
-
-            # ============================================================
-            # TRACKING + DIRECTION + STOPLINE VIOLATION LOGIC (FIX SIDE)
-            # ============================================================
-            for label, box, conf in detections:
-
-                # Scale box về size gốc
-                x1, y1, x2, y2 = [int(v / scale) for v in box]
-                cx, cy = (x1+x2)//2, (y1+y2)//2
-
-                # TRACK MATCH
-                track_id = None
-                best_dist = 9999
-                for tid, t in tracks.items():
-                    dist = get_distance((cx, cy), t["pos"])
-                    if dist < 55 and dist < best_dist:
-                        best_dist = dist
-                        track_id = tid
-
-                if track_id is None:
-                    track_id_counter += 1
-                    track_id = track_id_counter
-                    tracks[track_id] = {
-                        "pos": (cx, cy),
-                        "history": [],
-                        "plate": None,
-                        "province": None,
-                        "plate_retry": 5,  # Retry 5 lần
-                        "label": label,
-                        "violated": False,
-                        "entered": False,
-                        "crossed": False,
-                        "last_pos": (cx, cy),
-                        "direction": "unknown"
-                    }
-
-                tr = tracks[track_id]
-
-                # ---- Movement tracking ----
-                last_x, last_y = tr["pos"]
-                tr["pos"] = (cx, cy)
-                tr["last_seen"] = frame_count  # Update TTL
-
-                dx = cx - last_x
-                dy = cy - last_y
-
-                abs_dx = abs(dx)
-                abs_dy = abs(dy)
-
-                bw = x2 - x1
-                bh = y2 - y1
-
-                horizontal_move = abs_dx > 4 and abs_dx > abs_dy * 2
-                vertical_move = abs_dy > 4
-
-                # ---- Direction rule ----
-                if not horizontal_move and not vertical_move:
-                    direction = "idle"
-                elif horizontal_move and bw > bh * 1.6:
-                    direction = "side"
-                elif dy < -2:
-                    direction = "up"
-                elif dy > 2:
-                    direction = "down"
-                else:
-                    direction = "idle"
-
-                tr["direction"] = direction
-
-                # 🚫 SIDE → bỏ qua hoàn toàn
-                if direction == "side":
-                    continue
-
-                # =========================================
-                # LICENSE PLATE RECOGNITION (WITH RETRY)
-                # =========================================
-                if tr["plate"] is None and tr.get("plate_retry", 0) > 0:
-                    try:
-                        result = detect_and_read_plate(
-                            frame,
-                            (x1, y1, x2, y2),
-                            track_id=track_id,
-                            vehicle_label=label
-                        )
-                        detected_plate = result.get("plate", "Unknown")
-                        detected_province = result.get("province", "Unknown")
-                        
-                        # Nếu nhận diện được biển hợp lệ → lưu luôn
-                        if detected_plate and detected_plate != "Unknown":
-                            tr["plate"] = detected_plate
-                            tr["province"] = detected_province
-                        else:
-                            # Chưa rõ → giảm retry
-                            tr["plate_retry"] -= 1
-                            # Hết retry → gán Unknown
-                            if tr["plate_retry"] == 0:
-                                tr["plate"] = "Unknown"
-                                tr["province"] = "Unknown"
-                    except:
-                        tr["plate_retry"] -= 1
-                        if tr["plate_retry"] == 0:
-                            tr["plate"] = "Unknown"
-                            tr["province"] = "Unknown"
-
-                plate = tr.get("plate", "Unknown")
-                province = tr.get("province", "Unknown")
-
-                # ROI ENTER
-                if is_in_roi((x1, y1, x2, y2), ROI_POLYGON):
-                    tr["entered"] = True
-
-                # STOPLINE tolerance
-                tol = max(10, int((y2-y1) * 0.20))
-
-                violated_now = False
-
-                if light_state == "red" and tr["entered"]:
-                    expected_dir = "up" if CAMERA_DIRECTION_UP else "down"
-
-                    if tr["direction"] == expected_dir:
-                        if CAMERA_DIRECTION_UP:
-                            if y2 <= stopline_y - tol:
-                                violated_now = True
-                        else:
-                            if y1 >= stopline_y + tol:
-                                violated_now = True
-
-                    if CAMERA_DIRECTION_UP:
-                        if y2 < stopline_y:
-                            tr["crossed"] = True
-                    else:
-                        if y1 > stopline_y:
-                            tr["crossed"] = True
-
-                # SAVE VIOLATION
-                if violated_now and not tr["violated"]:
-                    tr["violated"] = True
-
-                    ts = datetime.now().strftime("%H%M%S")
-                    folder = os.path.join(OUTPUT_DIR, os.path.splitext(video_name)[0])
-                    os.makedirs(folder, exist_ok=True)
-
-                    crop = frame[y1:y2, x1:x2]
-                    crop_path = os.path.join(folder, f"{track_id}_{ts}_crop.jpg")
-                    context_path = os.path.join(folder, f"{track_id}_{ts}_context.jpg")
-
-                    if crop.size > 0:
-                        cv2.imwrite(crop_path, crop)
-                        ctx = frame.copy()
-                        cv2.rectangle(ctx, (x1,y1), (x2,y2), (0,0,255), 2)
-                        cv2.putText(ctx, "VIOLATION", (x1, y1-10),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,0,255), 2)
-                        cv2.imwrite(context_path, ctx)
-
-                        # ========= RELATIVE PATH =========
-                        rel_crop = os.path.relpath(crop_path, PROJECT_ROOT)
-                        rel_context = os.path.relpath(context_path, PROJECT_ROOT)
-                        # ==================================
-
-                    record = {
-                        "video": video_name,
-                        "track_id": track_id,
-                        "vehicle_type": tr["label"],
-                        "license_plate": plate,
-                        "province": province,
-                        "timestamp": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
-                        "crop_image": rel_crop,
-                        "context_image": rel_context
-                    }
-                    save_violation_record(record)
-
-                # DRAW BOX
-                color = (0,0,255) if tr["violated"] else (0,255,0)
-                cv2.rectangle(frame, (x1,y1), (x2,y2), color, 2)
-                cv2.putText(
-                    frame,
-                    f"{label} | {plate}",
-                    (x1, y1 - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7,
-                    color, 2
-                )
-
-            # Draw ROI + stopline
-            cv2.polylines(frame, [ROI_POLYGON], True, (255,255,0), 2)
-            cv2.line(frame, (0, stopline_y), (frame_width, stopline_y), (0,0,255), 3)
-
-            if frame_callback:
-                frame_callback(frame)
-
-            if save_output:
-                out.write(frame)
-
-            if display:
-                cv2.imshow("Traffic", frame)
-                if cv2.waitKey(1) == ord("q"):
+            batch_detections, n_detected = detect_vehicles_gated(
+                [item[4] for item in batch], [item[7] for item in batch], timer
+            )
+            if n_detected:
+                batch_sizes[n_detected] += 1
+
+            stopped = False
+            for (frame_idx, frame, t_capture, resized, _, scale, offset, _), detections in zip(batch, batch_detections):
+                if stop_flag and stop_flag.is_set():
+                    stopped = True
+                    break
+                # Kết quả OCR nền đã xong
+                dispatch_ocr_results(ocr_pool, processors)
+                with timer.stage("frame_total"):
+                    ok = processor.process_frame(frame_idx, frame, resized, scale, detections, offset, t_capture)
+                if not ok:
+                    stopped = True
                     break
+                processed += 1
+                # Độ trễ end-to-end: từ lúc đọc frame tới lúc xử lý xong
+                frame_skipper.observe(time.monotonic() - t_capture)
+            if stopped:
+                break
+
+        # Chờ OCR còn dở để patch các vi phạm chưa có biển, rồi chốt các track còn lại
+        ocr_pool.close()
+        dispatch_ocr_results(ocr_pool, processors)
+        processor.finalize_plates()
 
     finally:
+        profile_summary = profiler.stop()
         # Luôn release resources
-        if cap.isOpened():
-            cap.release()
+        source.release()
         if out is not None:
-            out.release()
-        cv2.destroyAllWindows()
+            out.close()
+        ocr_pool.close(timeout=0)
+        evidence_writer.close()
+        flush_violation_log()
+        if display:
+            cv2.destroyAllWindows()
+
+    elapsed = time.monotonic() - started_at
 
     return {
         "total_frames": frame_count,
-        "violations": [tid for tid, t in tracks.items() if t["violated"]],
-        "output_path": output_path
+        "violations": processor.violations(),
+        "output_path": output_path if save_output else None,
+        "processed_frames": processed,
+        "processing_fps": round(processed / elapsed, 2) if elapsed > 0 else None,
+        "dropped_frames": {
+            "reader": reader.dropped,
+            "skip": skip_dropped
+        },
+        "source": source.stats(),
+        "frame_skip": dict(frame_skipper.stats(), realtime=realtime),
+        "camera_config": processor.config_stats(),
+        "batch_sizes": dict(sorted(batch_sizes.items())),
+        "light_scheduler": processor.light_scheduler.stats(),
+        "motion_gate": processor.motion_gate_stats(),
+        "ocr_pool": ocr_pool.stats(),
+        "ocr_cache": ocr_cache.stats(),
+        "ocr_engines": ocr_stats.summary(),
+        "models": registry.info(),
+        "evidence": evidence_writer.stats(),
+        "video_output": out.stats() if out is not None else None,
+        "stages": timer.summary(),
+        "profile": profile_summary
     }
@@ -0,0 +1,312 @@
+"""
+Benchmark pipeline với video tổng hợp + model giả (không cần weights / GPU):
+
+    python -m benchmarks.run                       # chạy tất cả, lưu benchmarks/results/<time>.json
+    python -m benchmarks.run --suite tracker zones
+    python -m benchmarks.run --baseline benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import cv2
+
+from benchmarks.synthetic import write_video, zone_config, render_frames, PLATE_TEXTS, FRAME_SIZE
+from benchmarks.stubs import install_stubs
+
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+SUITES = ("tracker", "zones", "voting", "pipeline")
+
+
+# ==========================
+# 🧰 ĐO
+# ==========================
+def _measure(fn, repeat):
+    """Chạy fn repeat lần → thống kê latency (µs) + bộ nhớ cấp phát đỉnh (tracemalloc)"""
+    times = np.empty(repeat)
+    tracemalloc.start()
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn(i)
+        times[i] = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    us = times * 1e6
+    return {
+        "calls": repeat,
+        "throughput_per_s": round(float(repeat / times.sum()), 1),
+        "p50_us": round(float(np.percentile(us, 50)), 2),
+        "p95_us": round(float(np.percentile(us, 95)), 2),
+        "p99_us": round(float(np.percentile(us, 99)), 2),
+        "peak_alloc_kb": round(peak / 1024, 1)
+    }
+
+
+def _synthetic_boxes(rng, n, frame_size=FRAME_SIZE):
+    w, h = frame_size
+    x1 = rng.integers(0, w - 120, n)
+    y1 = rng.integers(0, h - 120, n)
+    return np.stack([x1, y1, x1 + rng.integers(20, 120, n), y1 + rng.integers(20, 120, n)], axis=1)
+
+
+# ==========================
+# 📍 TRACKER
+# ==========================
+def bench_tracker(densities=(10, 40, 80), frames=300, seed=0):
+    from core.tracker import VehicleTracker
+
+    results = {}
+    for n in densities:
+        rng = np.random.default_rng(seed)
+        base = _synthetic_boxes(rng, n)
+        drift = np.array([0, -4, 0, -4])
+        tracker = VehicleTracker()
+        labels = ["car"] * n
+
+        def step(i):
+            boxes = (base + drift * i).tolist()
+            tracker.update(boxes, labels, i + 1)
+            if (i + 1) % 30 == 0:
+                tracker.expire(i + 1)
+
+        results[f"{n}_detections"] = _measure(step, frames)
+    return results
+
+
+# ==========================
+# 🗺️ ZONES
+# ==========================
+def bench_zones(densities=(10, 40, 80), repeat=500, seed=0):
+    from core.zones import ZoneEngine
+
+    zone = zone_config()
+    engine = ZoneEngine.from_config(zone, FRAME_SIZE)
+    roi = np.array(zone["roi"], dtype=np.int32)
+
+    results = {}
+    for n in densities:
+        boxes = _synthetic_boxes(np.random.default_rng(seed), n)
+
+        def vectorized(_):
+            engine.classify(boxes)
+
+        # Cách cũ: pointPolygonTest từng box (để so sánh)
+        def per_object(_):
+            for x1, y1, x2, y2 in boxes:
+                cv2.pointPolygonTest(roi, (int((x1 + x2) // 2), int((y1 + y2) // 2)), False)
+
+        results[f"{n}_detections"] = {
+            "zone_engine": _measure(vectorized, repeat),
+            "point_polygon_test": _measure(per_object, repeat)
+        }
+    return results
+
+
+# ==========================
+# 🧠 OCR VOTING + CACHE
+# ==========================
+def bench_voting(tracks=50, reads_per_track=10, seed=0):
+    from core.license_plate_recognition import PlateVoteStore, read_plate
+    from core.plate_cache import PlateOCRCache
+
+    rng = np.random.default_rng(seed)
+    votes = PlateVoteStore()
+    reads = [
+        (int(t), PLATE_TEXTS[int(t) % len(PLATE_TEXTS)] if rng.random() > 0.2 else "51A00000",
+         float(rng.uniform(0.5, 1.0)))
+        for t in np.repeat(np.arange(tracks), reads_per_track)
+    ]
+
+    def vote(i):
+        votes.add(*reads[i])
+
+    # read_plate đầy đủ (cache + cascade + vote) trên crop biển từ video tổng hợp
+    for frame in render_frames(60, density=12, seed=seed):
+        pass
+    crops = _plate_crops(frame) or [np.full((20, 60, 3), 255, np.uint8)]
+    cache = PlateOCRCache()
+    ocr_votes = PlateVoteStore()
+
+    def read(i):
+        read_plate(crops[i % len(crops)], track_id=i % len(crops), cache=cache,
+                   votes=ocr_votes, accept_conf=0.85)
+
+    return {
+        "vote_add": _measure(vote, len(reads)),
+        "read_plate_cached": _measure(read, 200),
+        "cache": cache.stats()
+    }
+
+
+def _plate_crops(frame):
+    from core.vehicle_detection import detect_vehicles
+    from core.license_plate_recognition import detect_plate_regions_batch
+
+    vehicles = detect_vehicles(frame)
+    crops = detect_plate_regions_batch(frame, [(i, box) for i, (_, box, _) in enumerate(vehicles)])
+    return [c for c in crops.values() if c is not None]
+
+
+# ==========================
+# 🎥 FULL PIPELINE
+# ==========================
+def bench_pipeline(frames=300, density=6, seed=0, workdir=None, **process_kwargs):
+    import app.process_video as pv
+    from utils import data_logger
+    from utils.camera_config import CameraConfigService
+
+    workdir = workdir or tempfile.mkdtemp(prefix="bench_")
+    video_path = write_video(os.path.join(workdir, "synthetic.avi"), frames, density=density, seed=seed)
+
+    # Zone + output + log vào thư mục tạm (không đụng config / output thật), khôi phục sau khi chạy
+    config = CameraConfigService(os.path.join(workdir, "video_zones.json"))
+    config.update("synthetic.avi", zone_config())
+    # Logger nền giữ backend lúc tạo → thay cả logger (tạo lại trên backend tạm ở lần ghi đầu)
+    saved = pv.OUTPUT_DIR, data_logger._backend, data_logger._logger
+    pv.OUTPUT_DIR = os.path.join(workdir, "violations")
+    data_logger._backend = data_logger.JsonLinesBackend(os.path.join(workdir, "violations.jsonl"))
+    data_logger._logger = None
+
+    try:
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        t0 = time.perf_counter()
+        result = pv.process_video(video_path, save_output=False, instrument=True, config=config, **process_kwargs)
+        wall = time.perf_counter() - t0
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    finally:
+        data_logger.flush_violation_log()
+        pv.OUTPUT_DIR, data_logger._backend, data_logger._logger = saved
+
+    # OCR lỗi (exception trong worker) → benchmark đang đo đường xử lý lỗi, không phải OCR
+    if result["ocr_pool"]["failed"]:
+        print(f"⚠️ pipeline: {result['ocr_pool']['failed']}/{result['ocr_pool']['completed']} "
+              f"lần OCR lỗi – kết quả không đại diện cho OCR")
+
+    return {
+        "frames": frames,
+        "density": density,
+        "wall_s": round(wall, 3),
+        "processing_fps": result["processing_fps"],
+        "violations": len(result["violations"]),
+        "max_rss_mb": round(rss_after / 1024, 1),
+        "max_rss_growth_mb": round((rss_after - rss_before) / 1024, 1),
+        "stages": result["stages"],
+        "batch_sizes": result["batch_sizes"],
+        "motion_gate": result["motion_gate"],
+        "ocr_pool": result["ocr_pool"],
+        "ocr_cache": result["ocr_cache"]
+    }
+
+
+# ==========================
+# 📊 SO SÁNH BASELINE
+# ==========================
+# Metric so sánh: cao hơn là tốt hơn (throughput) hoặc thấp hơn là tốt hơn (latency)
+_HIGHER_BETTER = ("throughput_per_s", "processing_fps")
+_LOWER_BETTER = ("p50_us", "p95_us", "p99_us", "p50_ms", "p95_ms", "p99_ms", "wall_s")
+
+
+def _flatten(d, prefix=""):
+    for k, v in d.items():
+        key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            yield from _flatten(v, key)
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            yield key, v
+
+
+def compare(current, baseline):
+    """{metric: {"baseline", "current", "change_pct"}} cho các metric hiệu năng chung"""
+    base = dict(_flatten(baseline.get("suites", {})))
+    diff = {}
+    for key, value in _flatten(current.get("suites", {})):
+        metric = key.rsplit(".", 1)[-1]
+        if metric not in _HIGHER_BETTER + _LOWER_BETTER or key not in base or not base[key]:
+            continue
+        change = (value - base[key]) / base[key] * 100
+        diff[key] = {
+            "baseline": base[key],
+            "current": value,
+            "change_pct": round(change, 1),
+            "better": bool(change > 0 if metric in _HIGHER_BETTER else change < 0)
+        }
+    return diff
+
+
+# ==========================
+# ▶️ MAIN
+# ==========================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline vượt đèn đỏ (model giả)")
+    parser.add_argument("--suite", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--frames", type=int, default=300, help="số frame video tổng hợp")
+    parser.add_argument("--density", type=int, default=6, help="số xe trung bình / frame")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="nhân latency giả lập của model (0 = không sleep)")
+    parser.add_argument("--output", help="file JSON kết quả")
+    parser.add_argument("--baseline", help="file JSON kết quả trước đó để so sánh")
+    args = parser.parse_args(argv)
+
+    stubs = install_stubs(scale=args.latency_scale)
+
+    suites = {}
+    for name in args.suite:
+        print(f"▶️ {name} ...")
+        t0 = time.perf_counter()
+        if name == "tracker":
+            suites[name] = bench_tracker(seed=args.seed)
+        elif name == "zones":
+            suites[name] = bench_zones(seed=args.seed)
+        elif name == "voting":
+            suites[name] = bench_voting(seed=args.seed)
+        elif name == "pipeline":
+            suites[name] = bench_pipeline(args.frames, args.density, args.seed)
+        print(f"   xong sau {time.perf_counter() - t0:.1f}s")
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count()
+        },
+        "stub_calls": {name: getattr(m, "calls", None) for name, m in stubs.items()},
+        "suites": suites
+    }
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+        worse = [k for k, v in report["comparison"].items() if not v["better"] and abs(v["change_pct"]) >= 10]
+        for key in worse:
+            c = report["comparison"][key]
+            print(f"⚠️ {key}: {c['baseline']} → {c['current']} ({c['change_pct']:+.1f}%)")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"💾 Đã lưu: {output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
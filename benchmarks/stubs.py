@@ -0,0 +1,219 @@
+import time
+
+import cv2
+import numpy as np
+
+from core.model_registry import registry
+from benchmarks.synthetic import VEHICLE_COLOR, STRIPE_COLORS, PLATE_TEXTS
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+# Latency giả lập (ms): cố định / lần gọi + thêm / ảnh trong batch
+DEFAULT_LATENCY = {
+    "vehicle": (8.0, 4.0),
+    "traffic_light": (2.0, 1.0),
+    "lp_detector": (3.0, 1.5),
+    "lp_ocr": (2.0, 1.0),
+    "paddle_ocr": (15.0, 0.0),
+}
+
+COLOR_TOL = 40
+MIN_VEHICLE_AREA = 40
+
+
+# ==========================
+# 📦 Giả lập output ultralytics
+# ==========================
+class _Array(np.ndarray):
+    """ndarray có .cpu() / .numpy() như torch tensor"""
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return np.asarray(self)
+
+
+def _arr(data, dtype=np.float32):
+    return np.asarray(data, dtype=dtype).view(_Array)
+
+
+class _Box:
+    def __init__(self, xyxy, cls, conf):
+        self.xyxy = _arr([xyxy])
+        self.cls = _arr([cls])
+        self.conf = _arr([conf])
+
+
+class _Boxes:
+    def __init__(self, detections):
+        # detections: list (xyxy, cls, conf), sắp xếp theo conf giảm dần như YOLO
+        detections = sorted(detections, key=lambda d: -d[2])
+        self._items = [_Box(*d) for d in detections]
+        self.xyxy = _arr([d[0] for d in detections]).reshape(-1, 4)
+        self.cls = _arr([d[1] for d in detections])
+        self.conf = _arr([d[2] for d in detections])
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+
+class _Result:
+    def __init__(self, detections=(), probs=None, names=None):
+        self.boxes = _Boxes(list(detections))
+        self.probs = probs
+        self.names = names or {}
+
+
+class _Probs:
+    def __init__(self, top1, top1conf):
+        self.top1 = top1
+        self.top1conf = top1conf
+
+
+def _components(mask, min_area):
+    """Bounding box các vùng liên thông của mask"""
+    n, _, stats, _ = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=8)
+    return [
+        (int(x), int(y), int(x + w), int(y + h), int(area))
+        for x, y, w, h, area in stats[1:n]
+        if area >= min_area
+    ]
+
+
+def _color_mask(img, color, tol=COLOR_TOL):
+    c = np.array(color, dtype=np.int16)
+    return cv2.inRange(img, np.clip(c - tol, 0, 255).astype(np.uint8),
+                       np.clip(c + tol, 0, 255).astype(np.uint8)) > 0
+
+
+# ==========================
+# 🤖 STUB MODELS
+# ==========================
+class _StubYOLO:
+    """Model giả: xử lý từng ảnh bằng OpenCV + sleep latency, trả output kiểu ultralytics"""
+
+    def __init__(self, latency=(0.0, 0.0)):
+        self.fixed_ms, self.per_image_ms = latency
+        self.calls = 0
+        self.images = 0
+
+    def __call__(self, source, verbose=False, **kwargs):
+        images = source if isinstance(source, (list, tuple)) else [source]
+        self.calls += 1
+        self.images += len(images)
+        delay = (self.fixed_ms + self.per_image_ms * len(images)) / 1000
+        if delay > 0:
+            time.sleep(delay)
+        return [self._predict(img) for img in images]
+
+    def _predict(self, img):
+        raise NotImplementedError
+
+
+class StubVehicleModel(_StubYOLO):
+    """Xe = vùng màu VEHICLE_COLOR; nhỏ → motorcycle (cls 3), lớn → car (cls 2)"""
+
+    def _predict(self, img):
+        h, w = img.shape[:2]
+        detections = []
+        for x1, y1, x2, y2, area in _components(_color_mask(img, VEHICLE_COLOR), MIN_VEHICLE_AREA):
+            cls = 3 if (x2 - x1) < w * 0.05 else 2
+            detections.append(((x1, y1, x2, y2), cls, 0.9))
+        return _Result(detections)
+
+
+class StubTrafficLightModel(_StubYOLO):
+    """Đèn = màu chiếm nhiều pixel nhất trong ROI (0 green, 1 red, 2 yellow)"""
+
+    COLORS = {0: (0, 255, 0), 1: (0, 0, 255), 2: (0, 255, 255)}
+
+    def _predict(self, img):
+        best, best_count = None, 0
+        for cls, color in self.COLORS.items():
+            count = int(np.count_nonzero(_color_mask(img, color, 60)))
+            if count > best_count:
+                best, best_count = cls, count
+        if best is None or best_count < 20:
+            return _Result()
+        h, w = img.shape[:2]
+        return _Result([((0, 0, w, h), best, 0.9)])
+
+
+class StubPlateDetector(_StubYOLO):
+    """Biển số = vùng trắng lớn nhất trong crop xe (kể cả sọc màu bên trái)"""
+
+    def _predict(self, img):
+        white = np.all(img > 200, axis=2)
+        comps = _components(white, 6)
+        if not comps:
+            return _Result()
+        x1, y1, x2, y2, _ = max(comps, key=lambda c: c[4])
+        # Mở rộng sang trái để lấy cả sọc mã biển
+        x1 = max(0, x1 - max(2, (x2 - x1) // 6))
+        return _Result([((x1, y1, x2, y2), 0, 0.9)])
+
+
+def _stripe_index(img):
+    """Mã biển = màu sọc (STRIPE_COLORS) có nhiều pixel nhất"""
+    counts = [int(np.count_nonzero(_color_mask(img, c, 70))) for c in STRIPE_COLORS]
+    idx = int(np.argmax(counts))
+    return idx if counts[idx] > 0 else None
+
+
+class StubPlateOCR(_StubYOLO):
+    """YOLO OCR giả (classification): top1 = index biển theo màu sọc"""
+
+    def __init__(self, latency=(0.0, 0.0), conf=0.9):
+        super().__init__(latency)
+        self.conf = conf
+        self.names = dict(enumerate(PLATE_TEXTS))
+
+    def _predict(self, img):
+        idx = _stripe_index(img)
+        if idx is None:
+            return _Result(probs=None, names=self.names)
+        return _Result(probs=_Probs(idx, self.conf), names=self.names)
+
+
+class StubPaddleOCR:
+    """PaddleOCR giả: .ocr(img, cls=True) → [[[box, (text, conf)]]]"""
+
+    def __init__(self, latency=(0.0, 0.0), conf=0.8):
+        self.fixed_ms, self.per_image_ms = latency
+        self.conf = conf
+        self.calls = 0
+
+    def ocr(self, img, cls=True):
+        self.calls += 1
+        delay = (self.fixed_ms + self.per_image_ms) / 1000
+        if delay > 0:
+            time.sleep(delay)
+        idx = _stripe_index(img)
+        if idx is None:
+            return [None]
+        h, w = img.shape[:2]
+        return [[[[[0, 0], [w, 0], [w, h], [0, h]], (PLATE_TEXTS[idx], self.conf)]]]
+
+
+def install_stubs(latency=None, scale=1.0):
+    """
+    Thay toàn bộ model trong registry bằng stub (không cần weights / GPU).
+    latency: {name: (ms cố định, ms / ảnh)}, scale nhân toàn bộ latency.
+    """
+    lat = dict(DEFAULT_LATENCY, **(latency or {}))
+    lat = {k: (a * scale, b * scale) for k, (a, b) in lat.items()}
+    stubs = {
+        "vehicle": StubVehicleModel(lat["vehicle"]),
+        "traffic_light": StubTrafficLightModel(lat["traffic_light"]),
+        "lp_detector": StubPlateDetector(lat["lp_detector"]),
+        "lp_ocr": StubPlateOCR(lat["lp_ocr"]),
+        "paddle_ocr": StubPaddleOCR(lat["paddle_ocr"]),
+    }
+    for name, model in stubs.items():
+        registry.override(name, model)
+    return stubs
@@ -0,0 +1,122 @@
+import cv2
+import numpy as np
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+FRAME_SIZE = (1280, 720)
+FPS = 25
+ROAD_COLOR = (70, 70, 70)
+VEHICLE_COLOR = (180, 120, 60)      # BGR – stub detector nhận xe theo màu này
+PLATE_COLOR = (255, 255, 255)
+
+# Màu sọc trên biển số → index biển (stub OCR đọc màu sọc thay vì đọc chữ)
+STRIPE_COLORS = [
+    (0, 0, 255), (0, 255, 0), (255, 0, 0),
+    (0, 255, 255), (255, 0, 255), (255, 255, 0),
+]
+PLATE_TEXTS = ["51A12345", "29C67890", "30E24680", "43A13579", "59D11223", "79B99887"]
+
+# Màu đèn (BGR) và thời lượng mỗi pha (frame)
+LIGHT_COLORS = {"red": (0, 0, 255), "green": (0, 255, 0), "yellow": (0, 255, 255)}
+LIGHT_CYCLE = (("red", 150), ("green", 120), ("yellow", 30))
+
+
+def light_at(frame_idx, cycle=LIGHT_CYCLE):
+    """Trạng thái đèn tại frame_idx theo chu kỳ"""
+    period = sum(n for _, n in cycle)
+    t = frame_idx % period
+    for state, n in cycle:
+        if t < n:
+            return state
+        t -= n
+    return cycle[-1][0]
+
+
+def zone_config(frame_size=FRAME_SIZE):
+    """Entry video_zones.json cho video tổng hợp (ROI + stop line ngang)"""
+    w, h = frame_size
+    return {
+        "roi": [[int(w * 0.15), int(h * 0.2)], [int(w * 0.7), int(h * 0.2)],
+                [int(w * 0.7), int(h * 0.95)], [int(w * 0.15), int(h * 0.95)]],
+        "stop_line_y": int(h * 0.5)
+    }
+
+
+# ==========================
+# 🚗 XE TỔNG HỢP
+# ==========================
+class _Vehicle:
+    def __init__(self, rng, frame_size, plate_idx):
+        w, h = frame_size
+        self.motorcycle = rng.random() < 0.5
+        self.w = int(w * (0.03 if self.motorcycle else 0.07))
+        self.h = int(h * (0.09 if self.motorcycle else 0.14))
+        lane_x = rng.uniform(0.17, 0.68 - self.w / w)
+        self.x = int(w * lane_x)
+        self.y = float(h + rng.uniform(0, h * 0.1))
+        self.speed = rng.uniform(3.0, 8.0)      # px / frame, đi lên
+        self.plate_idx = plate_idx
+
+    def step(self):
+        self.y -= self.speed
+
+    def visible(self):
+        return self.y + self.h > 0
+
+    def draw(self, frame):
+        x1, y1 = self.x, int(self.y)
+        x2, y2 = x1 + self.w, y1 + self.h
+        cv2.rectangle(frame, (x1, y1), (x2, y2), VEHICLE_COLOR, -1)
+
+        # Biển số: nền trắng + sọc màu (mã biển) + chữ
+        pw, ph = int(self.w * 0.7), max(8, int(self.h * 0.18))
+        px1 = x1 + (self.w - pw) // 2
+        py1 = y2 - ph - max(2, int(self.h * 0.05))
+        cv2.rectangle(frame, (px1, py1), (px1 + pw, py1 + ph), PLATE_COLOR, -1)
+        stripe = max(3, pw // 8)
+        cv2.rectangle(frame, (px1, py1), (px1 + stripe, py1 + ph), STRIPE_COLORS[self.plate_idx], -1)
+        cv2.putText(frame, PLATE_TEXTS[self.plate_idx], (px1 + stripe + 1, py1 + ph - 2),
+                    cv2.FONT_HERSHEY_PLAIN, max(0.4, ph / 20), (0, 0, 0), 1)
+
+
+def render_frames(n_frames, frame_size=FRAME_SIZE, density=6, seed=0, cycle=LIGHT_CYCLE):
+    """
+    Sinh frame giao lộ tổng hợp (generator):
+    density = số xe trung bình cùng lúc trong khung hình,
+    đèn ở góc trên phải đổi màu theo chu kỳ.
+    """
+    rng = np.random.default_rng(seed)
+    w, h = frame_size
+    vehicles = []
+    # Xe sống ~1.2h / 5.5 frame (tốc độ TB 5.5 px/frame) → tốc độ sinh để giữ ~density xe
+    spawn_rate = density * 5.5 / (1.2 * h)
+
+    for i in range(n_frames):
+        frame = np.full((h, w, 3), ROAD_COLOR, dtype=np.uint8)
+
+        for _ in range(rng.poisson(spawn_rate)):
+            vehicles.append(_Vehicle(rng, frame_size, int(rng.integers(len(PLATE_TEXTS)))))
+
+        for v in vehicles:
+            v.step()
+            v.draw(frame)
+        vehicles = [v for v in vehicles if v.visible()]
+
+        # Đèn trong vùng ROI đèn (25% phải × 30% trên)
+        center = (int(w * 0.88), int(h * 0.12))
+        cv2.rectangle(frame, (center[0] - 25, center[1] - 60), (center[0] + 25, center[1] + 60), (30, 30, 30), -1)
+        cv2.circle(frame, center, 20, LIGHT_COLORS[light_at(i, cycle)], -1)
+
+        yield frame
+
+
+def write_video(path, n_frames=300, frame_size=FRAME_SIZE, density=6, seed=0, fps=FPS):
+    """Ghi video tổng hợp (MJPG .avi). Trả về path"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, frame_size)
+    try:
+        for frame in render_frames(n_frames, frame_size, density, seed):
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
@@ -1,31 +1,11 @@
-import os
 import cv2
 import numpy as np
 import re
-from collections import defaultdict, Counter
-from paddleocr import PaddleOCR
-from ultralytics import YOLO
+import threading
+import time
 
-# ==========================
-# ⚙️ LOAD MODELS
-# ==========================
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_DIR = os.path.join(BASE_DIR, "..", "models", "license_plate")
-
-lp_detector = YOLO(os.path.join(MODEL_DIR, "license_plate_detection.pt"))
-lp_ocr_yolo = YOLO(os.path.join(MODEL_DIR, "license_plate_ocr.pt"))
-
-paddle_ocr = PaddleOCR(
-    use_angle_cls=True,
-    lang='en',
-    show_log=False
-)
-
-# ==========================
-# 🧠 VOTING
-# track_id → [(text, conf)]
-# ==========================
-plate_votes = defaultdict(list)
+from core.model_registry import get_model, ModelLoadError
+from core.plate_cache import dhash
 
 # ==========================
 # 📏 Vietnam plate regex
@@ -102,14 +82,75 @@ def extract_province(plate_text: str) -> str:
     return PROVINCE_CODES.get(province_code, "Unknown")
 
 
+# ==========================
+# 🧠 VOTING
+# track_id → {text: tổng conf}
+# ==========================
+CONVERGE_MARGIN = 0.5    # (leader - á quân) / tổng trọng số
+# Số phiếu hợp lệ tối thiểu trước khi chốt: ≥ 2 để 1 lần đọc sai (nhòe / bị che) không chốt ngay;
+# track chưa hội tụ vẫn lấy leader khi hết PLATE_RETRY
+CONVERGE_MIN_VOTES = 2
+
+
+class PlateVoteStore:
+    """
+    Weighted voting biển số theo track_id, sống trong 1 lần chạy pipeline.
+    Chỉ giữ tally (text → tổng conf) thay vì toàn bộ list phiếu,
+    xóa cùng lúc với track để bộ nhớ không tăng mãi.
+    """
+
+    def __init__(self, margin=CONVERGE_MARGIN, min_votes=CONVERGE_MIN_VOTES):
+        self.margin = margin
+        self.min_votes = min_votes
+        self._tally = {}    # track_id → {"weights": {text: w}, "votes": n}
+        self._lock = threading.Lock()
+
+    def add(self, track_id, text, conf):
+        """Thêm 1 phiếu. Trả về (leader, converged)"""
+        with self._lock:
+            entry = self._tally.setdefault(track_id, {"weights": {}, "votes": 0})
+            if text and text != "Unknown":
+                entry["weights"][text] = entry["weights"].get(text, 0.0) + conf
+                entry["votes"] += 1
+            return self._decide(entry)
+
+    def result(self, track_id):
+        with self._lock:
+            entry = self._tally.get(track_id)
+            return self._decide(entry) if entry else ("Unknown", False)
+
+    def _decide(self, entry):
+        weights = entry["weights"]
+        if not weights:
+            return "Unknown", False
+
+        ranked = sorted(weights.items(), key=lambda kv: kv[1], reverse=True)
+        leader, top = ranked[0]
+        second = ranked[1][1] if len(ranked) > 1 else 0.0
+        total = sum(weights.values())
+
+        margin = (top - second) / total if total > 0 else 0.0
+        converged = entry["votes"] >= self.min_votes and margin >= self.margin
+        return leader, converged
+
+    def discard(self, track_id):
+        with self._lock:
+            self._tally.pop(track_id, None)
+
+    def __len__(self):
+        return len(self._tally)
+
+
 # ==========================
 # 🔍 OCR: YOLO + PaddleOCR
 # ==========================
 def ocr_paddle(img):
     """OCR bằng PaddleOCR"""
     try:
-        result = paddle_ocr.ocr(img, cls=True)
-    except:
+        result = get_model("paddle_ocr").ocr(img, cls=True)
+    except ModelLoadError:
+        raise
+    except Exception:
         return None, 0.0
 
     text = ""
@@ -119,6 +160,9 @@ def ocr_paddle(img):
         return None, 0.0
 
     for line in result:
+        # PaddleOCR trả [None] khi không thấy chữ
+        if not line:
+            continue
         for w in line:
             if len(w) < 2:
                 continue
@@ -135,8 +179,10 @@ def ocr_paddle(img):
 def ocr_yolo_plate(img):
     """OCR bằng YOLO OCR model"""
     try:
-        results = lp_ocr_yolo(img, verbose=False)
-    except:
+        results = get_model("lp_ocr")(img, verbose=False)
+    except ModelLoadError:
+        raise
+    except Exception:
         return None, 0.0
 
     if len(results) == 0:
@@ -154,12 +200,71 @@ def ocr_yolo_plate(img):
     return normalize(text_raw), conf
 
 
+# ==========================
+# 📊 OCR STATS (theo engine)
+# ==========================
+class OCREngineStats:
+    """Đếm số lần gọi / số lần được chọn / latency cho từng engine OCR"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines = {}
+
+    def record(self, engine, latency):
+        with self._lock:
+            e = self._engines.setdefault(
+                engine, {"calls": 0, "accepted": 0, "latency_total": 0.0, "latency_max": 0.0}
+            )
+            e["calls"] += 1
+            e["latency_total"] += latency
+            e["latency_max"] = max(e["latency_max"], latency)
+
+    def accept(self, engine):
+        with self._lock:
+            self._engines[engine]["accepted"] += 1
+
+    def summary(self):
+        with self._lock:
+            return {
+                name: {
+                    "calls": e["calls"],
+                    "accepted": e["accepted"],
+                    "latency_ms_avg": round(e["latency_total"] / e["calls"] * 1000, 1),
+                    "latency_ms_max": round(e["latency_max"] * 1000, 1)
+                }
+                for name, e in self._engines.items()
+            }
+
+
+def _timed(engine, fn, img, stats):
+    t0 = time.perf_counter()
+    text, conf = fn(img)
+    if stats is not None:
+        stats.record(engine, time.perf_counter() - t0)
+    return text, conf
+
+
 # ==========================
 # 🧠 BEST DECISION (YOLO + PaddleOCR)
 # ==========================
-def best_ocr_result(img):
-    yolo_text, yolo_conf = ocr_yolo_plate(img)
-    pad_text, pad_conf = ocr_paddle(img)
+# Cascade: YOLO OCR (rẻ) chạy trước, chỉ gọi PaddleOCR khi kết quả không hợp lệ / conf thấp
+OCR_ACCEPT_CONF = 0.85
+
+
+def best_ocr_result(img, accept_conf=None, stats=None):
+    """
+    accept_conf=None → chạy cả 2 engine rồi chọn.
+    accept_conf=x    → cascade: nhận luôn YOLO nếu biển hợp lệ VN và conf >= x
+    """
+    yolo_text, yolo_conf = _timed("YOLO", ocr_yolo_plate, img, stats)
+
+    if (accept_conf is not None and yolo_text
+            and is_valid_vietnam_plate(yolo_text) and yolo_conf >= accept_conf):
+        if stats is not None:
+            stats.accept("YOLO")
+        return yolo_text, yolo_conf
+
+    pad_text, pad_conf = _timed("Paddle", ocr_paddle, img, stats)
 
     candidates = []
 
@@ -179,6 +284,9 @@ def best_ocr_result(img):
 
     candidates.sort(key=score, reverse=True)
 
+    if stats is not None:
+        stats.accept(candidates[0][2])
+
     return candidates[0][0], candidates[0][1]
 
 
@@ -187,7 +295,7 @@ def best_ocr_result(img):
 # ==========================
 def detect_plate_region(vehicle_img):
     """Trả về crop biển số từ YOLO detector"""
-    results = lp_detector(vehicle_img, verbose=False)
+    results = get_model("lp_detector")(vehicle_img, verbose=False)
     if len(results) == 0 or len(results[0].boxes) == 0:
         return None
 
@@ -198,10 +306,106 @@ def detect_plate_region(vehicle_img):
     return crop if crop.size > 0 else None
 
 
+# ==========================
+# 📦 Batch: detect plate cho nhiều xe / 1 lần YOLO
+# ==========================
+PLATE_LETTERBOX_SIZE = 320
+
+
+def letterbox(img, size=PLATE_LETTERBOX_SIZE):
+    """Resize giữ tỉ lệ + pad về size×size. Trả về (ảnh, ratio, (pad_x, pad_y))"""
+    h, w = img.shape[:2]
+    r = size / max(h, w)
+    nw, nh = max(1, int(round(w * r))), max(1, int(round(h * r)))
+
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    pad_x, pad_y = (size - nw) // 2, (size - nh) // 2
+    canvas[pad_y:pad_y + nh, pad_x:pad_x + nw] = cv2.resize(img, (nw, nh))
+    return canvas, r, (pad_x, pad_y)
+
+
+def detect_plate_regions_batch(frame, items):
+    """
+    items: list (track_id, box) trên frame gốc
+    → {track_id: crop biển số (từ ảnh gốc) hoặc None}
+    """
+    crops = {}
+    inputs, metas = [], []
+
+    for track_id, box in items:
+        x1, y1, x2, y2 = map(int, box)
+        vehicle_crop = frame[max(y1, 0):y2, max(x1, 0):x2]
+        if vehicle_crop.size == 0:
+            crops[track_id] = None
+            continue
+
+        img, r, pad = letterbox(vehicle_crop)
+        inputs.append(img)
+        metas.append((track_id, vehicle_crop, r, pad))
+
+    if not inputs:
+        return crops
+
+    results = get_model("lp_detector")(inputs, imgsz=PLATE_LETTERBOX_SIZE, verbose=False)
+
+    for (track_id, vehicle_crop, r, (pad_x, pad_y)), res in zip(metas, results):
+        if len(res.boxes) == 0:
+            crops[track_id] = None
+            continue
+
+        # Map box từ ảnh letterbox về crop xe gốc (lấy box đầu tiên - conf cao nhất)
+        bx1, by1, bx2, by2 = res.boxes.xyxy[0].cpu().numpy()
+        h, w = vehicle_crop.shape[:2]
+        x1 = int(np.clip((bx1 - pad_x) / r, 0, w))
+        x2 = int(np.clip((bx2 - pad_x) / r, 0, w))
+        y1 = int(np.clip((by1 - pad_y) / r, 0, h))
+        y2 = int(np.clip((by2 - pad_y) / r, 0, h))
+
+        # Copy: crop được OCR ở thread nền trong khi frame gốc còn bị vẽ / tái sử dụng
+        crop = vehicle_crop[y1:y2, x1:x2]
+        crops[track_id] = crop.copy() if crop.size > 0 else None
+
+    return crops
+
+
 # ==========================
 # 🎯 Main API
 # ==========================
-def detect_and_read_plate(frame, box, track_id=None, vehicle_label="car"):
+def read_plate(lp_crop, track_id=None, cache=None, votes=None, accept_conf=None, ocr_stats=None):
+    """OCR 1 crop biển số + voting theo track_id"""
+    # STEP 2 — OCR (YOLO + Paddle), crop gần giống lần trước → dùng lại kết quả cache
+    cached = None
+    if cache is not None:
+        h = dhash(lp_crop)
+        cached = cache.lookup(track_id, h)
+        if cached is not None:
+            plate_text, conf = cached
+        else:
+            plate_text, conf = best_ocr_result(lp_crop, accept_conf, ocr_stats)
+            cache.put(track_id, h, (plate_text, conf))
+    else:
+        plate_text, conf = best_ocr_result(lp_crop, accept_conf, ocr_stats)
+
+    # STEP 3 — Voting theo track_id
+    # Cache hit = cùng 1 lần OCR (xe đứng yên) → không tính thêm phiếu cho CONVERGE_MIN_VOTES
+    if track_id is not None and votes is not None:
+        if cached is not None:
+            final, converged = votes.result(track_id)
+        else:
+            final, converged = votes.add(track_id, plate_text, conf)
+        province = extract_province(final)
+        return {"plate": final, "province": province, "converged": converged}
+
+    province = extract_province(plate_text)
+    return {"plate": plate_text, "province": province}
+
+
+def detect_and_read_plate(frame, box, track_id=None, vehicle_label="car", votes=None):
+    """
+    Detect + OCR biển số của 1 xe (pipeline dùng detect_plate_regions_batch + read_plate).
+    Có track_id + votes (PlateVoteStore) → kết quả đã voting, kèm "converged".
+    Không truyền votes → kết quả OCR của riêng lần đọc này, không voting.
+    """
     x1, y1, x2, y2 = map(int, box)
     vehicle_crop = frame[y1:y2, x1:x2]
 
@@ -214,21 +418,5 @@ def detect_and_read_plate(frame, box, track_id=None, vehicle_label="car"):
     if lp_crop is None:
         return {"plate": "Unknown", "province": "Unknown"}
 
-    # STEP 2 — OCR (YOLO + Paddle)
-    plate_text, conf = best_ocr_result(lp_crop)
+    return read_plate(lp_crop, track_id, votes=votes)
 
-    # STEP 3 — Voting theo track_id
-    if track_id is not None:
-        plate_votes[track_id].append((plate_text, conf))
-
-        # Weighted voting
-        counter = Counter()
-        for p, c in plate_votes[track_id]:
-            counter[p] += c
-
-        final = counter.most_common(1)[0][0]
-        province = extract_province(final)
-        return {"plate": final, "province": province}
-
-    province = extract_province(plate_text)
-    return {"plate": plate_text, "province": province}
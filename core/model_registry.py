@@ -0,0 +1,159 @@
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+
+# ==========================
+# ⚙️ MODEL PATHS
+# ==========================
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MODEL_DIR = os.path.join(PROJECT_ROOT, "models")
+
+# name → (loại model, file weights). Nhiều name trỏ cùng 1 file → dùng chung 1 instance
+MODEL_SPECS = {
+    "vehicle": ("yolo", "yolov8m.pt"),
+    "traffic_light": ("yolo", os.path.join(MODEL_DIR, "traffic_light", "traffic_light.pt")),
+    "lp_detector": ("yolo", os.path.join(MODEL_DIR, "license_plate", "license_plate_detection.pt")),
+    "lp_ocr": ("yolo", os.path.join(MODEL_DIR, "license_plate", "license_plate_ocr.pt")),
+    "paddle_ocr": ("paddle", "en"),
+}
+
+
+def _rss_bytes():
+    try:
+        import psutil  # đi kèm ultralytics
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+
+def _param_bytes(model):
+    """Dung lượng weights (torch) của YOLO model"""
+    try:
+        return sum(p.numel() * p.element_size() for p in model.model.parameters())
+    except Exception:
+        return None
+
+
+class ModelLoadError(RuntimeError):
+    """Không load được model (thiếu thư viện / file weights) – pipeline phải dừng, không nuốt lỗi"""
+
+
+def _load(kind, source):
+    if kind == "yolo":
+        from ultralytics import YOLO
+        return YOLO(source)
+    if kind == "paddle":
+        from paddleocr import PaddleOCR
+        return PaddleOCR(use_angle_cls=True, lang=source, show_log=False)
+    raise ValueError(f"Unknown model kind: {kind}")
+
+
+def _dummy_inference(kind, model):
+    if kind == "yolo":
+        model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+    else:
+        model.ocr(np.zeros((48, 160, 3), dtype=np.uint8), cls=True)
+
+
+# ==========================
+# 🗂️ REGISTRY
+# ==========================
+class ModelRegistry:
+    """
+    Load model lần đầu được dùng (lazy), 1 instance / 1 file weights,
+    ghi lại thời gian load + bộ nhớ của từng model
+    """
+
+    def __init__(self, specs=MODEL_SPECS):
+        self.specs = dict(specs)
+        self._models = {}     # (kind, source) → model
+        self._info = {}       # (kind, source) → thông tin load / warmup
+        self._lock = threading.Lock()
+
+    def _key(self, name):
+        if name not in self.specs:
+            raise KeyError(f"Unknown model: {name}")
+        kind, source = self.specs[name]
+        if kind == "yolo" and os.path.exists(source):
+            source = os.path.abspath(source)
+        return kind, source
+
+    def get(self, name):
+        key = self._key(name)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                return model
+
+            rss_before = _rss_bytes()
+            t0 = time.perf_counter()
+            try:
+                model = _load(*key)
+            except Exception as e:
+                raise ModelLoadError(f"Không load được model {name} ({key[1]}): {e}") from e
+            load_time = time.perf_counter() - t0
+            rss_after = _rss_bytes()
+
+            memory = _param_bytes(model) if key[0] == "yolo" else None
+            if memory is None and rss_before is not None and rss_after is not None:
+                memory = max(0, rss_after - rss_before)
+
+            self._info[key] = {
+                "load_time_s": round(load_time, 3),
+                "memory_mb": round(memory / 2**20, 1) if memory is not None else None
+            }
+            self._models[key] = model
+            logging.info(f"📦 Loaded {key[1]} ({load_time:.2f}s)")
+            return model
+
+    def load(self, names=None):
+        """Load trước các model (không warm-up): thiếu thư viện / weights → ModelLoadError ngay khi bắt đầu"""
+        for name in names or list(self.specs):
+            self.get(name)
+
+    def override(self, name, model):
+        """Thay model thật bằng object khác (stub benchmark / test)"""
+        key = self._key(name)
+        with self._lock:
+            self._models[key] = model
+            self._info[key] = {"load_time_s": 0.0, "memory_mb": None, "override": True}
+
+    def warmup(self, names=None):
+        """Load + chạy 1 lần inference giả cho các model (tránh trễ ở frame đầu)"""
+        for name in names or list(self.specs):
+            model = self.get(name)
+            key = self._key(name)
+            t0 = time.perf_counter()
+            try:
+                _dummy_inference(key[0], model)
+            except Exception as e:
+                logging.warning(f"⚠️ Warm-up {name} lỗi: {e}")
+                continue
+            self._info[key]["warmup_s"] = round(time.perf_counter() - t0, 3)
+
+    def info(self):
+        """Thông tin các model đã load, theo name"""
+        result = {}
+        for name in self.specs:
+            key = self._key(name)
+            if key in self._info:
+                result[name] = dict(self._info[key], weights=key[1])
+        return result
+
+
+registry = ModelRegistry()
+
+
+def get_model(name):
+    return registry.get(name)
+
+
+def warmup(names=None):
+    registry.warmup(names)
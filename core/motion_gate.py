@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+MOTION_GATE_WIDTH = 160       # px – so sánh frame ở độ phân giải rất thấp
+MOTION_PIXEL_DIFF = 25        # chênh lệch độ sáng (0-255) coi là pixel chuyển động
+MOTION_MIN_RATIO = 0.003      # tỉ lệ pixel chuyển động tối thiểu trong vùng ROI
+MOTION_HANGOVER = 15          # số frame vẫn chạy detect sau lần chuyển động cuối
+
+
+# ==========================
+# 💤 MOTION GATE
+# ==========================
+class MotionGate:
+    """
+    Cổng chuyển động rẻ chạy trước YOLO:
+    frame difference (gray, blur, downscale) chỉ trong polygon ROI.
+    Không có chuyển động (và không còn track sống) → bỏ qua detect xe.
+    """
+
+    def __init__(self, roi_polygon, frame_size, width=MOTION_GATE_WIDTH,
+                 pixel_diff=MOTION_PIXEL_DIFF, min_ratio=MOTION_MIN_RATIO, hangover=MOTION_HANGOVER):
+        frame_width, frame_height = frame_size
+        self.scale = min(1.0, width / frame_width)
+        self.size = (max(1, int(frame_width * self.scale)), max(1, int(frame_height * self.scale)))
+        self.pixel_diff = pixel_diff
+        self.min_ratio = min_ratio
+        self.hangover = hangover
+
+        # Mask ROI ở độ phân giải thấp
+        self.mask = np.zeros((self.size[1], self.size[0]), dtype=np.uint8)
+        poly = np.round(np.asarray(roi_polygon, dtype=np.float32) * self.scale).astype(np.int32)
+        cv2.fillPoly(self.mask, [poly], 255)
+        self._mask_bool = self.mask > 0
+        self._mask_area = max(1, int(np.count_nonzero(self._mask_bool)))
+
+        self._prev = None
+        self._since_motion = hangover + 1
+
+        self.checked = 0
+        self.gated = 0
+        self.last_ratio = 0.0
+
+    def _small_gray(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def has_motion(self, frame):
+        """Có chuyển động trong ROI so với frame trước không (frame đầu luôn True)"""
+        gray = self._small_gray(frame)
+        prev, self._prev = self._prev, gray
+        if prev is None:
+            return True
+
+        diff = cv2.absdiff(gray, prev)
+        moving = np.count_nonzero((diff > self.pixel_diff) & self._mask_bool)
+        self.last_ratio = moving / self._mask_area
+        return self.last_ratio >= self.min_ratio
+
+    def should_detect(self, frame, live_tracks):
+        """
+        True → chạy detect xe cho frame này.
+        Bỏ qua chỉ khi: không chuyển động, hết hangover và không còn track sống.
+        """
+        self.checked += 1
+        if self.has_motion(frame):
+            self._since_motion = 0
+        else:
+            self._since_motion += 1
+
+        if live_tracks or self._since_motion <= self.hangover:
+            return True
+
+        self.gated += 1
+        return False
+
+    def stats(self):
+        return {
+            "checked": self.checked,
+            "gated": self.gated,
+            "gated_ratio": round(self.gated / self.checked, 3) if self.checked else 0.0,
+            "last_motion_ratio": round(self.last_ratio, 4)
+        }
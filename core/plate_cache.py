@@ -0,0 +1,96 @@
+import sys
+import threading
+from collections import OrderedDict, defaultdict
+
+import cv2
+import numpy as np
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+CACHE_MAX_ENTRIES = 512
+CACHE_MAX_DISTANCE = 4   # Hamming distance tối đa (trên 64 bit) coi như cùng 1 crop
+HASH_SIZE = 8
+
+
+# ==========================
+# 🔑 Perceptual hash
+# ==========================
+def dhash(img, size=HASH_SIZE):
+    """dHash của crop biển số: so sánh độ sáng 2 pixel liền kề (bền với thay đổi sáng/tối)"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+# ==========================
+# 🗃️ OCR CACHE (LRU)
+# ==========================
+class PlateOCRCache:
+    """
+    Cache (text, conf) OCR theo track_id + dHash của crop biển số.
+    Crop gần giống (Hamming <= max_distance) của cùng track → dùng lại kết quả cũ.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_distance=CACHE_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+
+        self._entries = OrderedDict()        # (track_id, hash) → (text, conf)
+        self._by_track = defaultdict(set)    # track_id → {hash}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, track_id, h):
+        with self._lock:
+            for other in self._by_track.get(track_id, ()):
+                if bin(h ^ other).count("1") <= self.max_distance:
+                    key = (track_id, other)
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+
+            self.misses += 1
+            return None
+
+    def put(self, track_id, h, result):
+        with self._lock:
+            key = (track_id, h)
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            self._by_track[track_id].add(h)
+
+            while len(self._entries) > self.max_entries:
+                (old_tid, old_h), _ = self._entries.popitem(last=False)
+                self._drop_index(old_tid, old_h)
+
+    def discard(self, track_id):
+        """Xóa toàn bộ entry của 1 track (track hết TTL)"""
+        with self._lock:
+            for h in self._by_track.pop(track_id, ()):
+                self._entries.pop((track_id, h), None)
+
+    def _drop_index(self, track_id, h):
+        hashes = self._by_track.get(track_id)
+        if hashes is not None:
+            hashes.discard(h)
+            if not hashes:
+                del self._by_track[track_id]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            memory = sys.getsizeof(self._entries) + sys.getsizeof(self._by_track)
+            for (tid, h), (text, conf) in self._entries.items():
+                memory += sys.getsizeof(h) + sys.getsizeof(text) + sys.getsizeof(conf)
+
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "memory_bytes": memory
+            }
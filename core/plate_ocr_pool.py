@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from core.license_plate_recognition import read_plate
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+# PaddleOCR dùng chung 1 predictor → mặc định 1 worker, tăng lên nếu model cho phép
+OCR_WORKERS = 1
+OCR_QUEUE_SIZE = 32
+
+
+# ==========================
+# 🧵 OCR WORKER POOL
+# ==========================
+class PlateOCRPool:
+    """
+    OCR biển số chạy nền, tách khỏi vòng lặp frame:
+    - submit() không block: queue đầy → job bị drop (track sẽ thử lại frame sau)
+    - drain() trả về các kết quả đã xong để merge vào track
+    """
+
+    def __init__(self, workers=OCR_WORKERS, max_queue=OCR_QUEUE_SIZE, read_fn=read_plate, timer=None):
+        self._read_fn = read_fn
+        self._timer = timer     # StageTimer (tùy chọn): thời gian OCR thuần, không tính chờ queue
+        self._jobs = queue.Queue(maxsize=max_queue)
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.failed = 0
+        self._latencies = deque(maxlen=1000)
+
+        self._threads = [
+            threading.Thread(target=self._worker, daemon=True)
+            for _ in range(max(1, workers))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, track_id, frame_idx, lp_crop):
+        """Gửi 1 crop biển số. Trả về False nếu bị drop."""
+        if self._closed:
+            return False
+        try:
+            self._jobs.put_nowait((track_id, frame_idx, lp_crop, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def _worker(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+
+            track_id, frame_idx, lp_crop, t0 = job
+            t_start = time.perf_counter()
+            try:
+                result = self._read_fn(lp_crop, track_id)
+                failed = False
+            except Exception:
+                result = {"plate": "Unknown", "province": "Unknown"}
+                failed = True
+            if self._timer is not None:
+                self._timer.add("plate_ocr", time.perf_counter() - t_start)
+
+            with self._lock:
+                self.completed += 1
+                self.failed += failed
+                self._latencies.append(time.monotonic() - t0)
+
+            self._results.put((track_id, frame_idx, result))
+
+    def drain(self):
+        """Lấy tất cả kết quả đã xong: list (track_id, frame_idx, result)"""
+        done = []
+        while True:
+            try:
+                done.append(self._results.get_nowait())
+            except queue.Empty:
+                return done
+
+    def close(self, timeout=10):
+        """Chờ các job còn lại chạy xong rồi dừng worker."""
+        if self._closed:
+            return
+        self._closed = True
+
+        deadline = time.monotonic() + timeout
+        for _ in self._threads:
+            try:
+                self._jobs.put(None, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for t in self._threads:
+            t.join(timeout=max(0.0, deadline - time.monotonic()))
+
+    def stats(self):
+        with self._lock:
+            lat = np.array(self._latencies) * 1000 if self._latencies else None
+            return {
+                "queue_depth": self._jobs.qsize(),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "latency_ms_avg": round(float(lat.mean()), 1) if lat is not None else None,
+                "latency_ms_p95": round(float(np.percentile(lat, 95)), 1) if lat is not None else None,
+                "latency_ms_max": round(float(lat.max()), 1) if lat is not None else None
+            }
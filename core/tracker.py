@@ -0,0 +1,139 @@
+import numpy as np
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+MATCH_DISTANCE = 55   # px (size gốc) – xa hơn coi như xe mới
+TRACK_TTL = 60        # Xóa track sau 60 frame không thấy
+PLATE_RETRY = 5       # Retry OCR 5 lần / track
+SPEED_ALPHA = 0.3     # EMA cho tốc độ xe (px / frame)
+
+
+# ==========================
+# 📍 TRACKER
+# ==========================
+class VehicleTracker:
+    """
+    Tracking theo tâm bbox:
+    - Ma trận khoảng cách detections × tracks tính bằng NumPy
+    - Gán 1-1 greedy theo khoảng cách tăng dần (mỗi track chỉ nhận 1 detection)
+    - Cập nhật hướng di chuyển + TTL cho toàn bộ tracks trong 1 lần
+    - speed: EMA tốc độ lớn nhất (px / frame gốc) → giới hạn frame skip
+    """
+
+    def __init__(self, max_distance=MATCH_DISTANCE, ttl=TRACK_TTL, plate_retry=PLATE_RETRY):
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.plate_retry = plate_retry
+
+        self.tracks = {}
+        self._next_id = 0
+        self.speed = 0.0
+
+    def _new_track(self, label, pos):
+        self._next_id += 1
+        self.tracks[self._next_id] = {
+            "pos": pos,
+            "history": [],
+            "plate": None,
+            "province": None,
+            "plate_retry": self.plate_retry,
+            "label": label,
+            "violated": False,
+            "entered": False,
+            "crossed": False,
+            "last_pos": pos,
+            "direction": "unknown"
+        }
+        return self._next_id
+
+    def _assign(self, centers):
+        """Trả về list track_id (hoặc None) cho từng detection."""
+        assigned = [None] * len(centers)
+        if not self.tracks:
+            return assigned
+
+        track_ids = list(self.tracks.keys())
+        track_pos = np.array([self.tracks[tid]["pos"] for tid in track_ids], dtype=np.float32)
+
+        diff = centers[:, None, :].astype(np.float32) - track_pos[None, :, :]
+        dist = np.sqrt((diff ** 2).sum(axis=2))
+
+        # Chỉ xét các cặp trong ngưỡng, duyệt theo khoảng cách tăng dần
+        det_idx, trk_idx = np.nonzero(dist < self.max_distance)
+        order = np.argsort(dist[det_idx, trk_idx], kind="stable")
+
+        used_tracks = set()
+        for k in order:
+            d, t = det_idx[k], trk_idx[k]
+            if assigned[d] is not None or t in used_tracks:
+                continue
+            assigned[d] = track_ids[t]
+            used_tracks.add(t)
+
+        return assigned
+
+    def update(self, boxes, labels, frame_idx):
+        """
+        Gán detections (box size gốc) vào tracks, tạo track mới nếu cần.
+        Trả về list track_id theo đúng thứ tự detections.
+        """
+        if len(boxes) == 0:
+            return []
+
+        b = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        centers = np.stack([(b[:, 0] + b[:, 2]) // 2, (b[:, 1] + b[:, 3]) // 2], axis=1)
+
+        assigned = self._assign(centers)
+
+        prev = np.empty_like(centers)
+        gaps = np.zeros(len(assigned), dtype=np.float32)   # 0 = track mới
+        for i, tid in enumerate(assigned):
+            if tid is None:
+                pos = (int(centers[i, 0]), int(centers[i, 1]))
+                assigned[i] = self._new_track(labels[i], pos)
+            else:
+                gaps[i] = max(1, frame_idx - self.tracks[tid].get("last_seen", frame_idx - 1))
+            prev[i] = self.tracks[assigned[i]]["pos"]
+
+        # ---- Movement + direction (vectorized) ----
+        dx = centers[:, 0] - prev[:, 0]
+        dy = centers[:, 1] - prev[:, 1]
+        abs_dx, abs_dy = np.abs(dx), np.abs(dy)
+        # Tốc độ xe nhanh nhất trong frame (chỉ track đã match)
+        matched = gaps > 0
+        if matched.any():
+            step = np.hypot(dx[matched], dy[matched]) / gaps[matched]
+            self.speed = SPEED_ALPHA * float(step.max()) + (1 - SPEED_ALPHA) * self.speed
+
+        bw = b[:, 2] - b[:, 0]
+        bh = b[:, 3] - b[:, 1]
+
+        horizontal_move = (abs_dx > 4) & (abs_dx > abs_dy * 2)
+        vertical_move = abs_dy > 4
+
+        directions = np.select(
+            [
+                ~horizontal_move & ~vertical_move,
+                horizontal_move & (bw > bh * 1.6),
+                dy < -2,
+                dy > 2
+            ],
+            ["idle", "side", "up", "down"],
+            default="idle"
+        )
+
+        for i, tid in enumerate(assigned):
+            tr = self.tracks[tid]
+            tr["last_pos"] = tr["pos"]
+            tr["pos"] = (int(centers[i, 0]), int(centers[i, 1]))
+            tr["last_seen"] = frame_idx  # Update TTL
+            tr["direction"] = str(directions[i])
+
+        return assigned
+
+    def expire(self, frame_idx):
+        """Xóa các track quá TTL, trả về {track_id: track} đã xóa (để chốt dữ liệu còn dở)."""
+        dead = [tid for tid, t in self.tracks.items()
+                if frame_idx - t.get("last_seen", 0) > self.ttl]
+        return {tid: self.tracks.pop(tid) for tid in dead}
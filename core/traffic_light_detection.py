@@ -1,10 +1,7 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
 
-# 🔧 Đường dẫn model YOLO
-MODEL_PATH = "models/traffic_light/traffic_light.pt"
-traffic_light_model = YOLO(MODEL_PATH)
+from core.model_registry import get_model
 
 # 🟦 Cấu hình vùng ROI đèn giao thông
 # (cắt phía trên bên phải của khung hình)
@@ -26,7 +23,7 @@ def detect_traffic_light(frame):
     roi = get_roi(frame)
 
     # Phát hiện bằng YOLO
-    results = traffic_light_model(roi, verbose=False)
+    results = get_model("traffic_light")(roi, verbose=False)
     if len(results) > 0 and len(results[0].boxes) > 0:
         classes = results[0].boxes.cls.cpu().numpy()
         # 0: green, 1: red, 2: yellow
@@ -67,3 +64,71 @@ def detect_traffic_light(frame):
         return "yellow"
     else:
         return "green"
+
+
+# ⏱️ Scheduler: chỉ chạy lại model khi ROI đèn thay đổi
+# (đèn chỉ đổi trạng thái sau vài chục giây)
+LIGHT_CHANGE_THRESHOLD = 0.3   # ngưỡng L1 giữa 2 histogram hue
+LIGHT_MAX_STALE_FRAMES = 30    # tối đa bao nhiêu frame dùng lại kết quả cũ
+SIGNATURE_SIZE = (48, 32)
+
+
+def light_signature(frame):
+    """
+    🔎 Signature rẻ của ROI đèn: histogram hue (downscale) của các pixel sáng
+    """
+    roi = get_roi(frame)
+    small = cv2.resize(roi, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+
+    # chỉ lấy pixel sáng + đủ bão hòa (bóng đèn đang bật)
+    mask = cv2.inRange(hsv, (0, 80, 120), (180, 255, 255))
+    hist = cv2.calcHist([hsv], [0], mask, [18], [0, 180]).ravel()
+
+    total = hist.sum()
+    return hist / total if total > 0 else hist
+
+
+class TrafficLightScheduler:
+    """
+    🚦 Gọi detect_traffic_light khi signature đổi quá ngưỡng hoặc kết quả quá cũ,
+    các frame còn lại trả về trạng thái lần chạy gần nhất
+    """
+
+    def __init__(self, threshold=LIGHT_CHANGE_THRESHOLD, max_stale_frames=LIGHT_MAX_STALE_FRAMES):
+        self.threshold = threshold
+        self.max_stale_frames = max_stale_frames
+
+        self._signature = None
+        self._state = None
+        self._frames_since_run = 0
+
+        self.model_calls = 0
+        self.skipped = 0
+
+    def update(self, frame):
+        signature = light_signature(frame)
+
+        if (self._state is not None
+                and self._frames_since_run < self.max_stale_frames
+                and np.abs(signature - self._signature).sum() < self.threshold):
+            self._frames_since_run += 1
+            self.skipped += 1
+            return self._state
+
+        state = detect_traffic_light(frame)
+        self.model_calls += 1
+
+        # So với signature lúc chạy model (không phải frame trước) để tránh trôi dần
+        self._signature = signature
+        self._state = state
+        self._frames_since_run = 0
+        return state
+
+    def stats(self):
+        total = self.model_calls + self.skipped
+        return {
+            "model_calls": self.model_calls,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skipped / total, 3) if total else 0.0
+        }
@@ -1,11 +1,9 @@
-from ultralytics import YOLO
+from core.model_registry import get_model
 
-model = YOLO("yolov8m.pt")
 
-def detect_vehicles(frame):
-    results = model(frame, verbose=False)
+def _parse_vehicles(result):
     vehicles = []
-    for box in results[0].boxes:
+    for box in result.boxes:
         cls_id = int(box.cls[0])
         if cls_id in [2, 3]:  # car, motorcycle
             x1, y1, x2, y2 = map(int, box.xyxy[0])
@@ -13,3 +11,16 @@ def detect_vehicles(frame):
             label = "car" if cls_id == 2 else "motorcycle"
             vehicles.append((label, (x1, y1, x2, y2), conf))
     return vehicles
+
+
+def detect_vehicles(frame):
+    results = get_model("vehicle")(frame, verbose=False)
+    return _parse_vehicles(results[0])
+
+
+def detect_vehicles_batch(frames):
+    """Nhận diện xe cho nhiều frame trong 1 lần inference (batch)."""
+    if not frames:
+        return []
+    results = get_model("vehicle")(list(frames), verbose=False)
+    return [_parse_vehicles(r) for r in results]
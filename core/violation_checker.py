@@ -1,35 +1,25 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 import cv2
 import numpy as np
-from ultralytics import YOLO
-import os
 from datetime import datetime
 
+# 🔍 Model lấy từ registry chung (lazy load, dùng chung instance với các module khác)
+from core.model_registry import get_model
+
 # =======================
 # 🔧 CONFIGURATION
 # =======================
-VEHICLE_MODEL_PATH = "yolov8m.pt"
-LICENSE_PLATE_MODEL_PATH = "models/license_plate/license_plate_detection.pt"
-OCR_MODEL_PATH = "models/license_plate/license_plate_ocr.pt"
-TRAFFIC_LIGHT_MODEL_PATH = "models/traffic_light/traffic_light.pt"
-
 STOPLINE_Y = 500  # y-coordinate line stop
 VIOLATION_DIR = "output/violations"
 os.makedirs(VIOLATION_DIR, exist_ok=True)
 
-# =======================
-# 🔍 MODEL INITIALIZATION
-# =======================
-vehicle_detector = YOLO(VEHICLE_MODEL_PATH)
-license_plate_detector = YOLO(LICENSE_PLATE_MODEL_PATH)
-ocr_detector = YOLO(OCR_MODEL_PATH)
-traffic_light_detector = YOLO(TRAFFIC_LIGHT_MODEL_PATH)
-
-
 # =======================
 # 🚦 TRAFFIC LIGHT DETECTION
 # =======================
 def get_traffic_light_state(frame):
-    results = traffic_light_detector(frame)
+    results = get_model("traffic_light")(frame)
     if len(results) == 0:
         return "unknown"
 
@@ -72,7 +62,7 @@ def recognize_characters(chars):
     lp_text = ""
     y_coords = []
     for char_img, (x, y) in chars:
-        results = ocr_detector(char_img)
+        results = get_model("lp_ocr")(char_img)
         if len(results[0].boxes) > 0:
             cls = int(results[0].boxes.cls[0].cpu().numpy())
             lp_text += str(cls) if cls < 10 else chr(65 + (cls - 10))
@@ -150,13 +140,13 @@ def process_video(video_path, display=True, frame_callback=None):
                     (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.0,
                     (0, 0, 255) if traffic_state == "red" else (0, 255, 0), 3)
 
-        vehicle_results = vehicle_detector(frame)
+        vehicle_results = get_model("vehicle")(frame)
         vehicles = vehicle_results[0].boxes.xyxy.cpu().numpy()
 
         for i, vehicle_box in enumerate(vehicles):
             vehicle_id = i
             if check_red_light_violation(vehicle_box, traffic_state):
-                lp_results = license_plate_detector(frame)
+                lp_results = get_model("lp_detector")(frame)
                 lp_boxes = lp_results[0].boxes.xyxy.cpu().numpy()
 
                 for lp_box in lp_boxes:
@@ -0,0 +1,149 @@
+import cv2
+import numpy as np
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+STOPLINE_TOL_MIN = 10       # px – tolerance tối thiểu khi xét vượt vạch
+STOPLINE_TOL_RATIO = 0.20   # tolerance theo chiều cao bbox
+
+DIRECTIONS = ("up", "down")
+
+
+def _polyline(points):
+    """Polyline stop line, sắp xếp theo x để nội suy y(x)"""
+    pts = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    if len(pts) < 2:
+        raise ValueError("Stop line cần ít nhất 2 điểm")
+    return pts[np.argsort(pts[:, 0], kind="stable")]
+
+
+# ==========================
+# 🗺️ ZONE ENGINE
+# ==========================
+class ZoneEngine:
+    """
+    Hình học vùng của 1 camera, dựng 1 lần từ video_zones.json:
+    - ROI raster thành mask → kiểm tra điểm O(1)
+    - Stop line là polyline bất kỳ (vạch xiên), y(x) nội suy tuyến tính
+    - Nhiều làn (polygon + hướng đi riêng, có thể có stop line riêng)
+    classify() xét toàn bộ detections trong 1 lần NumPy.
+
+    Config (tương thích ngược với "stop_line_y"):
+        {"roi": [[x, y], ...],
+         "stop_line": [[x, y], ...]  hoặc  "stop_line_y": 360,
+         "lanes": [{"name": "L1", "polygon": [[x, y], ...], "direction": "up",
+                    "stop_line": [[x, y], ...]?}, ...]?}
+    """
+
+    def __init__(self, frame_size, roi, stop_line, lanes=None, default_direction="up"):
+        if default_direction not in DIRECTIONS:
+            raise ValueError(f"Unknown direction: {default_direction}")
+
+        self.frame_width, self.frame_height = frame_size
+        self.roi = np.asarray(roi, dtype=np.int32).reshape(-1, 2)
+        self.default_direction = default_direction
+
+        # Mask ROI (1 byte / pixel)
+        self.roi_mask = np.zeros((self.frame_height, self.frame_width), dtype=np.uint8)
+        cv2.fillPoly(self.roi_mask, [self.roi], 1)
+
+        # Stop line: index 0 = vạch chung, 1..n = vạch riêng của từng làn
+        self.stop_lines = [_polyline(stop_line)]
+
+        # Làn: mask nhãn (0 = ngoài mọi làn, i+1 = làn i)
+        self.lanes = []
+        self.lane_mask = np.zeros((self.frame_height, self.frame_width), dtype=np.uint8)
+        lane_dirs = [default_direction]
+        lane_lines = [0]
+        for i, lane in enumerate(lanes or []):
+            direction = lane.get("direction", default_direction)
+            if direction not in DIRECTIONS:
+                raise ValueError(f"Unknown direction for lane {lane.get('name', i)}: {direction}")
+            polygon = np.asarray(lane["polygon"], dtype=np.int32).reshape(-1, 2)
+            cv2.fillPoly(self.lane_mask, [polygon], i + 1)
+
+            line_idx = 0
+            if lane.get("stop_line"):
+                self.stop_lines.append(_polyline(lane["stop_line"]))
+                line_idx = len(self.stop_lines) - 1
+
+            self.lanes.append({
+                "name": lane.get("name", f"lane{i + 1}"),
+                "polygon": polygon,
+                "direction": direction
+            })
+            lane_dirs.append(direction)
+            lane_lines.append(line_idx)
+
+        # Tra cứu theo nhãn làn (0 = mặc định)
+        self._lane_up = np.array([d == "up" for d in lane_dirs])
+        self._lane_line = np.array(lane_lines)
+
+    @classmethod
+    def from_config(cls, zone, frame_size, default_direction="up"):
+        """Dựng từ 1 entry của video_zones.json"""
+        if zone.get("stop_line"):
+            stop_line = zone["stop_line"]
+        else:
+            y = zone["stop_line_y"]
+            stop_line = [(0, y), (frame_size[0], y)]
+        return cls(frame_size, zone["roi"], stop_line, zone.get("lanes"), default_direction)
+
+    def line_y(self, xs, line_idx=0):
+        """y của stop line tại các x (ngoài 2 đầu thì giữ y đầu mút)"""
+        pts = self.stop_lines[line_idx]
+        return np.interp(xs, pts[:, 0], pts[:, 1])
+
+    def _lookup(self, mask, xs, ys):
+        xs = np.clip(xs, 0, self.frame_width - 1)
+        ys = np.clip(ys, 0, self.frame_height - 1)
+        return mask[ys, xs]
+
+    def classify(self, boxes):
+        """
+        boxes: (N, 4) x1, y1, x2, y2 (size gốc) → dict các mảng N phần tử:
+          in_roi    – tâm bbox nằm trong ROI
+          lane      – index làn (-1 nếu ngoài mọi làn)
+          direction – hướng đi đúng luật của làn ("up" / "down")
+          crossed   – cạnh sau của xe đã qua stop line
+          past      – đã qua stop line quá tolerance (điều kiện vi phạm)
+        Hướng "up": xét cạnh dưới (y2), "down": xét cạnh trên (y1).
+        """
+        b = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        cx = (b[:, 0] + b[:, 2]) // 2
+        cy = (b[:, 1] + b[:, 3]) // 2
+
+        in_roi = self._lookup(self.roi_mask, cx, cy).astype(bool)
+        label = self._lookup(self.lane_mask, cx, cy).astype(np.int32)
+        up = self._lane_up[label]
+        line_idx = self._lane_line[label]
+
+        line_y = np.empty(len(b), dtype=np.float64)
+        for idx in np.unique(line_idx):
+            sel = line_idx == idx
+            line_y[sel] = self.line_y(cx[sel], idx)
+
+        tol = np.maximum(STOPLINE_TOL_MIN, ((b[:, 3] - b[:, 1]) * STOPLINE_TOL_RATIO).astype(np.int32))
+        edge = np.where(up, b[:, 3], b[:, 1])
+        # Khoảng đã vượt qua vạch theo hướng đi (> 0 → đã qua)
+        beyond = np.where(up, line_y - edge, edge - line_y)
+
+        return {
+            "in_roi": in_roi,
+            "lane": label - 1,
+            "direction": np.where(up, "up", "down"),
+            "crossed": beyond > 0,
+            "past": beyond >= tol
+        }
+
+    def lane_name(self, lane_idx):
+        return self.lanes[lane_idx]["name"] if lane_idx >= 0 else None
+
+    def draw(self, frame):
+        """Vẽ ROI, các làn và stop line"""
+        cv2.polylines(frame, [self.roi], True, (255,255,0), 2)
+        for lane in self.lanes:
+            cv2.polylines(frame, [lane["polygon"]], True, (255,0,255), 1)
+        for pts in self.stop_lines:
+            cv2.polylines(frame, [pts.astype(np.int32)], False, (0,0,255), 3)
@@ -0,0 +1,304 @@
+import os
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+
+from utils.file_io import file_lock, write_json_atomic
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CONFIG_PATH = os.path.join(PROJECT_ROOT, "config", "video_zones.json")
+CONFIG_CHECK_INTERVAL = 1.0     # giây giữa 2 lần kiểm tra mtime của file config
+
+DIRECTIONS = ("up", "down")
+
+# Knob hiệu năng / tracking chỉnh được theo từng camera (khóa "settings" trong entry):
+# tên → kiểu hợp lệ. Giá trị không khai báo lấy mặc định của process_video.
+CAMERA_SETTINGS = {
+    "direction": str,               # hướng mặc định khi không khai báo làn ("up" / "down")
+    "frame_skip": int,              # skip cố định (realtime: mức tối thiểu)
+    "max_frame_skip": int,          # skip tối đa khi realtime
+    "latency_budget": float,        # giây, độ trễ mục tiêu khi realtime
+    "resize_width": int,            # ảnh cho đèn + motion gate
+    "detect_width": int,            # ảnh đưa vào YOLO xe
+    "roi_crop": bool,
+    "roi_margin": float,
+    "motion_gate": bool,
+    "track_ttl": int,               # frame không thấy → xóa track
+    "match_distance": float,        # px, ngưỡng match của tracker
+    "plate_retry": int,
+    "ttl_check_interval": int,
+    "light_change_threshold": float,    # ngưỡng đổi signature đèn → chạy lại model đèn
+    "light_max_stale_frames": int,      # tối đa số frame dùng lại kết quả đèn cũ
+    "motion_gate_width": int,           # px, độ phân giải so sánh của motion gate
+    "motion_pixel_diff": int,           # chênh lệch độ sáng coi là pixel chuyển động
+    "motion_min_ratio": float,          # tỉ lệ pixel chuyển động tối thiểu trong ROI
+    "motion_hangover": int              # frame vẫn detect sau lần chuyển động cuối
+}
+_NON_NEGATIVE_SETTINGS = ("roi_margin", "motion_hangover")   # cho phép = 0, còn lại phải > 0
+
+
+# ==========================
+# ✅ VALIDATE
+# ==========================
+def _points(value, min_points, what):
+    try:
+        pts = np.asarray(value, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError(f"{what}: phải là list [[x, y], ...]")
+    if pts.ndim != 2 or pts.shape[1] != 2 or len(pts) < min_points:
+        raise ValueError(f"{what}: cần ít nhất {min_points} điểm [x, y]")
+    return pts.astype(int).tolist()
+
+
+def validate_settings(settings):
+    """Kiểm tra knob theo camera → dict đã chuẩn hóa kiểu. Sai tên / kiểu → ValueError"""
+    if not isinstance(settings, dict):
+        raise ValueError("settings: phải là object")
+    clean = {}
+    for key, value in settings.items():
+        kind = CAMERA_SETTINGS.get(key)
+        if kind is None:
+            raise ValueError(f"settings: knob không hỗ trợ: {key}")
+        # bool là int trong Python → kiểm tra riêng
+        if kind is bool:
+            ok = isinstance(value, bool)
+        elif kind is str:
+            ok = isinstance(value, str)
+        else:
+            ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+            if kind is int:
+                ok = ok and float(value).is_integer()
+        if not ok:
+            raise ValueError(f"settings.{key}: cần kiểu {kind.__name__}, nhận {value!r}")
+        if kind in (int, float):
+            value = kind(value)
+            if value < 0 or (value == 0 and key not in _NON_NEGATIVE_SETTINGS):
+                raise ValueError(f"settings.{key}: phải dương")
+        clean[key] = value
+
+    if clean.get("direction", "up") not in DIRECTIONS:
+        raise ValueError(f"settings.direction: {clean['direction']} (cần up / down)")
+    return clean
+
+
+def validate_zone(zone):
+    """
+    Kiểm tra 1 entry của video_zones.json → bản đã chuẩn hóa (ValueError nếu sai):
+    roi ≥ 3 điểm, stop_line ≥ 2 điểm hoặc stop_line_y, lanes có polygon + hướng hợp lệ, settings đúng kiểu.
+    """
+    if not isinstance(zone, dict):
+        raise ValueError("entry phải là object")
+
+    clean = {"roi": _points(zone.get("roi"), 3, "roi")}
+    if zone.get("stop_line"):
+        clean["stop_line"] = _points(zone["stop_line"], 2, "stop_line")
+    elif isinstance(zone.get("stop_line_y"), (int, float)) and not isinstance(zone["stop_line_y"], bool):
+        clean["stop_line_y"] = int(zone["stop_line_y"])
+    else:
+        raise ValueError("cần stop_line_y (số) hoặc stop_line (polyline)")
+
+    if zone.get("lanes") is not None:
+        if not isinstance(zone["lanes"], list):
+            raise ValueError("lanes: phải là list")
+        lanes = []
+        for i, lane in enumerate(zone["lanes"]):
+            if not isinstance(lane, dict):
+                raise ValueError(f"lanes[{i}]: phải là object")
+            lane = dict(lane, polygon=_points(lane.get("polygon"), 3, f"lanes[{i}].polygon"))
+            if lane.get("direction", "up") not in DIRECTIONS:
+                raise ValueError(f"lanes[{i}].direction: {lane['direction']} (cần up / down)")
+            if lane.get("stop_line"):
+                lane["stop_line"] = _points(lane["stop_line"], 2, f"lanes[{i}].stop_line")
+            lanes.append(lane)
+        clean["lanes"] = lanes
+
+    if zone.get("settings"):
+        clean["settings"] = validate_settings(zone["settings"])
+    return clean
+
+
+# =========================
+# 📐 DEFAULT ROI
+# =========================
+def get_dynamic_roi(frame_width, frame_height):
+    top_y = int(frame_height * 0.15)
+    bottom_y = int(frame_height * 0.80)
+    left_x = int(frame_width * 0.10)
+    right_x = int(frame_width * 0.90)
+    return np.array([
+        (left_x, top_y),
+        (right_x, top_y),
+        (right_x, bottom_y),
+        (left_x, bottom_y)
+    ])
+
+
+def default_zone(frame_size):
+    frame_width, frame_height = frame_size
+    return {
+        "roi": get_dynamic_roi(frame_width, frame_height).tolist(),
+        "stop_line_y": int(frame_height * 0.5)
+    }
+
+
+def _read_file(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        zones = json.load(f)
+    if not isinstance(zones, dict):
+        raise ValueError("file config phải là object {tên video: entry}")
+    return zones
+
+
+# ==========================
+# 🗂️ CAMERA CONFIG SERVICE
+# ==========================
+class CameraConfigService:
+    """
+    Config theo camera (ROI, stop line, làn, knob hiệu năng) đọc từ video_zones.json:
+    - Parse + validate 1 lần, giữ trong RAM; poll() kiểm tra mtime (tối đa 1 lần / check_interval)
+      và chỉ đọc lại khi file đổi
+    - Entry sai khi reload → log lỗi, giữ bản hợp lệ trước đó
+    - version(name) tăng mỗi lần entry đổi → pipeline áp config mới ở ranh giới frame
+    - Ghi (tạo entry mặc định / update) dưới file lock + rename atomic → nhiều process chạy cùng lúc
+      không làm hỏng file hay mất entry của nhau
+    Thread-safe.
+    """
+
+    def __init__(self, path=CONFIG_PATH, check_interval=CONFIG_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+
+        self._lock = threading.RLock()
+        self._zones = {}        # name → entry hợp lệ
+        self._versions = {}     # name → version
+        self._invalid = {}      # name → lỗi validate (entry chưa từng hợp lệ)
+        self._stamp = None      # (mtime_ns, size) lần đọc gần nhất
+        self._next_check = 0.0
+
+        self.reloads = 0
+        self.errors = 0
+        with self._lock:
+            self._reload()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _reload(self):
+        """Đọc lại file → list tên camera có entry thay đổi"""
+        stamp = self._file_stamp()
+        try:
+            raw = _read_file(self.path)
+        except (OSError, ValueError) as e:
+            # File lỗi cú pháp (đang sửa tay ...) → giữ toàn bộ config cũ
+            logging.error(f"❌ Không đọc được {self.path}, giữ config cũ: {e}")
+            self.errors += 1
+            self._stamp = stamp
+            return []
+
+        # Dựng lại danh sách entry lỗi mỗi lần đọc: entry lỗi đã bị xóa / sửa thì không còn chặn get()
+        self._invalid = {}
+        changed = []
+        for name, zone in raw.items():
+            try:
+                zone = validate_zone(zone)
+            except ValueError as e:
+                logging.error(f"❌ [{name}] Config không hợp lệ, giữ bản cũ: {e}")
+                self.errors += 1
+                if name not in self._zones:
+                    self._invalid[name] = str(e)
+                continue
+            if self._zones.get(name) != zone:
+                self._zones[name] = zone
+                self._versions[name] = self._versions.get(name, 0) + 1
+                changed.append(name)
+
+        # Entry bị xóa khỏi file: pipeline đang chạy giữ config đã áp, lần get sau tạo mặc định
+        for name in [n for n in self._zones if n not in raw]:
+            del self._zones[name]
+
+        self._stamp = stamp
+        self.reloads += 1
+        return changed
+
+    def poll(self, force=False):
+        """Đọc lại nếu file đổi (mtime / size). → list camera có config mới"""
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return []
+        with self._lock:
+            self._next_check = now + self.check_interval
+            if self._file_stamp() == self._stamp:
+                return []
+            changed = self._reload()
+        if changed:
+            logging.info(f"🔄 Đã tải lại config: {', '.join(changed)}")
+        return changed
+
+    def get(self, name, frame_size=None):
+        """
+        Entry (bản copy) của camera. Chưa có + có frame_size → tạo ROI / stop line mặc định và ghi file.
+        Entry sai cú pháp → ValueError (không ghi đè config người dùng đang sửa).
+        """
+        self.poll()
+        with self._lock:
+            if name not in self._zones:
+                if name in self._invalid:
+                    raise ValueError(f"Config camera {name} không hợp lệ: {self._invalid[name]}")
+                if frame_size is None:
+                    return None
+                self.update(name, default_zone(frame_size), overwrite=False)
+            return json.loads(json.dumps(self._zones[name]))
+
+    def version(self, name):
+        return self._versions.get(name, 0)
+
+    def update(self, name, zone, overwrite=True):
+        """
+        Ghi entry của 1 camera (validate trước). Đọc lại file dưới lock để không mất entry
+        process khác vừa ghi; overwrite=False → giữ entry đã có (tạo mặc định).
+        """
+        zone = validate_zone(zone)
+        with self._lock, file_lock(self.path):
+            try:
+                raw = _read_file(self.path)
+            except ValueError as e:
+                raise ValueError(f"Không ghi được {self.path}: file đang lỗi ({e})")
+            if overwrite or name not in raw:
+                raw[name] = zone
+                write_json_atomic(self.path, raw, fsync=True, indent=4)
+            self._reload()
+            self._next_check = time.monotonic() + self.check_interval
+        return self.version(name)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "cameras": len(self._zones),
+            "reloads": self.reloads,
+            "errors": self.errors
+        }
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_config_service():
+    """Service dùng chung trong process (đọc config/video_zones.json)"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = CameraConfigService()
+        return _service
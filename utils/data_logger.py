@@ -1,41 +1,469 @@
 import json
 import os
+import queue
+import atexit
+import sqlite3
 import threading
-from datetime import datetime
+import time
+from datetime import datetime, date, timedelta
+
+from utils.file_io import file_lock, atomic_write
 
 # ✅ Đảm bảo trỏ đúng tới output/violations
-LOG_FILE = os.path.abspath(os.path.join(
+LOG_DIR = os.path.abspath(os.path.join(
     os.path.dirname(__file__),
-    "..", "output", "violations", "violations.json"
+    "..", "output", "violations"
 ))
 
+# File JSON cũ (mảng JSON, ghi lại toàn bộ mỗi lần) → chỉ còn dùng để migrate
+LOG_FILE = os.path.join(LOG_DIR, "violations.json")
+JSONL_FILE = os.path.join(LOG_DIR, "violations.jsonl")
+SQLITE_FILE = os.path.join(LOG_DIR, "violations.db")
+
+# "jsonl" (append-only) hoặc "sqlite" (có index video / timestamp / biển số)
+LOG_BACKEND = os.environ.get("VIOLATION_LOG_BACKEND", "jsonl")
+
+FLUSH_INTERVAL = 0.5    # giây
+FLUSH_BATCH = 64        # số bản ghi tối đa / lần ghi
+
 # ✅ Tạo thư mục nếu chưa tồn tại
-os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+os.makedirs(LOG_DIR, exist_ok=True)
 
-# ✅ Khóa thread-safe (tránh ghi chồng)
-_lock = threading.Lock()
 
-def save_violation_record(record: dict):
-    """Lưu bản ghi vi phạm vào file JSON (thread-safe)."""
-    with _lock:
+# ==========================
+# 🔎 LỌC BẢN GHI (lịch sử)
+# ==========================
+def _day_bounds(date_from=None, date_to=None):
+    """date / "YYYY-MM-DD" → [start, end) dạng chuỗi so sánh được với timestamp ISO"""
+    def _as_date(d):
+        return date.fromisoformat(d) if isinstance(d, str) else d
+
+    start = _as_date(date_from).isoformat() if date_from else None
+    end = (_as_date(date_to) + timedelta(days=1)).isoformat() if date_to else None
+    return start, end
+
+
+def record_matches(record, video=None, plate=None, date_from=None, date_to=None):
+    """Bản ghi có khớp bộ lọc (video chính xác, biển số chứa chuỗi, khoảng ngày) không"""
+    if video and record.get("video") != video:
+        return False
+    if plate and plate.upper() not in (record.get("license_plate") or "").upper():
+        return False
+    start, end = _day_bounds(date_from, date_to)
+    ts = record.get("timestamp") or ""
+    if start and ts < start:
+        return False
+    if end and ts >= end:
+        return False
+    return True
+
+
+# ==========================
+# 📄 JSON LINES (append-only)
+# ==========================
+class JsonLinesBackend:
+    """
+    Mỗi dòng 1 bản ghi, chỉ append (O(1) / bản ghi, crash chỉ mất dòng cuối).
+    Cập nhật = append 1 dòng {"_patch": record_id, "updates": {...}}, merge khi đọc.
+    Đọc tăng dần: chỉ parse phần file mới append kể từ lần đọc trước.
+    """
+
+    def __init__(self, path=JSONL_FILE):
+        self.path = path
+        self._read_lock = threading.Lock()
+        self._reset_cache()
+
+    def _reset_cache(self):
+        self._records, self._index = [], {}
+        self._offset = 0
+        self._inode = None
+
+    def append(self, records):
+        self._write_lines(records)
+
+    def update(self, patches):
+        self._write_lines({"_patch": rid, "updates": upd} for rid, upd in patches)
+
+    def _write_lines(self, items):
+        data = "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items)
+        if not data:
+            return
+        # 1 lần write với O_APPEND → không chen ngang giữa các process
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+    def _refresh(self):
+        """Parse các dòng mới (file bị thay / cắt ngắn → đọc lại từ đầu)"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset_cache()
+            return
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            self._reset_cache()
+            self._inode = st.st_ino
+        if st.st_size == self._offset:
+            return
+
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Chỉ nhận tới dòng hoàn chỉnh cuối cùng (dòng đang ghi dở để lần sau)
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+
+        records, index = self._records, self._index
+        for line in data[:end].splitlines():
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # dòng ghi dở khi crash
+
+            if "_patch" in item:
+                pos = index.get(item["_patch"])
+                if pos is not None:
+                    records[pos].update(item.get("updates", {}))
+                continue
+
+            if item.get("record_id"):
+                index[item["record_id"]] = len(records)
+            records.append(item)
+
+    def _snapshot(self):
+        with self._read_lock:
+            self._refresh()
+            return list(self._records)
+
+    def iter_records(self):
+        yield from self._snapshot()
+
+    def query(self, offset=0, limit=None, **filters):
+        """(tổng số khớp, trang bản ghi mới → cũ)"""
+        matched = [r for r in reversed(self._snapshot()) if record_matches(r, **filters)]
+        end = None if limit is None else offset + limit
+        return len(matched), matched[offset:end]
+
+    def iter_matching(self, **filters):
+        for r in self._snapshot():
+            if record_matches(r, **filters):
+                yield r
+
+    def videos(self):
+        return sorted({r.get("video") for r in self._snapshot() if r.get("video")})
+
+
+# ==========================
+# 🗄️ SQLITE
+# ==========================
+class SQLiteBackend:
+    """SQLite nhúng, index theo video / timestamp / biển số"""
+
+    COLUMNS = ("video", "track_id", "license_plate", "timestamp")
+
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS violations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    record_id TEXT UNIQUE,
+                    video TEXT,
+                    track_id INTEGER,
+                    license_plate TEXT,
+                    timestamp TEXT,
+                    data TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_video ON violations(video)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_timestamp ON violations(timestamp)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_plate ON violations(license_plate)")
+
+    def append(self, records):
+        rows = [
+            (r.get("record_id"),) + tuple(r.get(c) for c in self.COLUMNS)
+            + (json.dumps(r, ensure_ascii=False),)
+            for r in records
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO violations "
+                "(record_id, video, track_id, license_plate, timestamp, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def update(self, patches):
+        with self._lock, self._conn:
+            for record_id, updates in patches:
+                row = self._conn.execute(
+                    "SELECT data FROM violations WHERE record_id = ?", (record_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                record = json.loads(row[0])
+                record.update(updates)
+                self._conn.execute(
+                    "UPDATE violations SET license_plate = ?, data = ? WHERE record_id = ?",
+                    (record.get("license_plate"), json.dumps(record, ensure_ascii=False), record_id)
+                )
+
+    def iter_records(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM violations ORDER BY id").fetchall()
+        for (data,) in rows:
+            yield json.loads(data)
+
+    @staticmethod
+    def _where(video=None, plate=None, date_from=None, date_to=None):
+        clauses, params = [], []
+        if video:
+            clauses.append("video = ?")
+            params.append(video)
+        if plate:
+            clauses.append("license_plate LIKE ?")
+            params.append(f"%{plate.upper()}%")
+        start, end = _day_bounds(date_from, date_to)
+        if start:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            clauses.append("timestamp < ?")
+            params.append(end)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, offset=0, limit=None, **filters):
+        """(tổng số khớp, trang bản ghi mới → cũ) – lọc + phân trang trong SQL"""
+        where, params = self._where(**filters)
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM violations{where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT data FROM violations{where} ORDER BY id DESC LIMIT ? OFFSET ?",
+                params + [-1 if limit is None else limit, offset]
+            ).fetchall()
+        return total, [json.loads(data) for (data,) in rows]
+
+    def iter_matching(self, batch=500, **filters):
+        """Duyệt theo từng lô (không load hết vào RAM)"""
+        where, params = self._where(**filters)
+        last_id = 0
+        while True:
+            cond = f"{where} AND id > ?" if where else " WHERE id > ?"
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, data FROM violations{cond} ORDER BY id LIMIT ?",
+                    params + [last_id, batch]
+                ).fetchall()
+            if not rows:
+                return
+            for row_id, data in rows:
+                yield json.loads(data)
+            last_id = rows[-1][0]
+
+    def videos(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT video FROM violations WHERE video IS NOT NULL ORDER BY video"
+            ).fetchall()
+        return [v for (v,) in rows]
+
+
+BACKENDS = {
+    "jsonl": JsonLinesBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+# ==========================
+# 🔁 MIGRATE violations.json cũ
+# ==========================
+def migrate_legacy_json(backend, legacy_path=LOG_FILE):
+    """
+    Chuyển mảng JSON cũ sang backend mới (1 lần), đổi tên file cũ thành .migrated.
+    Idempotent giữa các process: đã có .migrated hoặc process khác vừa migrate xong → bỏ qua.
+    """
+    migrated_path = legacy_path + ".migrated"
+    if not os.path.exists(legacy_path) or os.path.exists(migrated_path):
+        return 0
+
+    with file_lock(legacy_path):  # chỉ 1 process migrate (batch nhiều worker)
+        # Kiểm tra lại sau khi có lock: process khác có thể đã migrate trong lúc chờ
+        if not os.path.exists(legacy_path) or os.path.exists(migrated_path):
+            return 0
+
         try:
-            # Đọc file cũ (nếu có)
-            if os.path.exists(LOG_FILE) and os.path.getsize(LOG_FILE) > 0:
-                with open(LOG_FILE, "r", encoding="utf-8") as f:
-                    try:
-                        data = json.load(f)
-                    except json.JSONDecodeError:
-                        data = []
-            else:
-                data = []
-
-            # Ghi thêm record mới
-            record["saved_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            data.append(record)
-
-            # Ghi lại file
-            with open(LOG_FILE, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                data = json.load(f) if os.path.getsize(legacy_path) > 0 else []
+        except FileNotFoundError:
+            return 0
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"[migrate_legacy_json] ❌ Không đọc được {legacy_path}: {e}")
+            return 0
+
+        if data:
+            backend.append(data)
+        try:
+            os.replace(legacy_path, migrated_path)
+        except FileNotFoundError:
+            # Đã được đổi tên (đã migrate) → không phải lỗi
+            pass
+    return len(data)
+
+
+# ==========================
+# ✍️ BACKGROUND FLUSHER
+# ==========================
+class ViolationLogger:
+    """Gom bản ghi vào queue, thread nền ghi theo batch xuống backend"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, record):
+        self._queue.put(("add", record))
 
+    def update(self, record_id, updates):
+        self._queue.put(("update", (record_id, updates)))
+
+    def flush(self, timeout=10):
+        """Chờ tới khi mọi bản ghi đã gửi được ghi xuống đĩa"""
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            try:
+                while len(items) < FLUSH_BATCH and items[-1][0] != "flush":
+                    items.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+            self._write(items)
+
+    def _write(self, items):
+        # Giữ đúng thứ tự add → update (patch phải đến sau bản ghi gốc)
+        adds, patches = [], []
+        for op, payload in items:
+            try:
+                if op == "add":
+                    if patches:
+                        self.backend.update(patches)
+                        patches = []
+                    adds.append(payload)
+                elif op == "update":
+                    if adds:
+                        self.backend.append(adds)
+                        adds = []
+                    patches.append(payload)
+                else:  # flush
+                    if adds:
+                        self.backend.append(adds)
+                        adds = []
+                    if patches:
+                        self.backend.update(patches)
+                        patches = []
+                    payload.set()
+            except Exception as e:
+                print(f"[ViolationLogger] ❌ Ghi log lỗi: {e}")
+                adds, patches = [], []
+        try:
+            if adds:
+                self.backend.append(adds)
+            if patches:
+                self.backend.update(patches)
         except Exception as e:
-            print(f"[save_violation_record] ❌ Ghi JSON lỗi: {e}")
+            print(f"[ViolationLogger] ❌ Ghi log lỗi: {e}")
+
+
+# ✅ Khóa thread-safe (khởi tạo backend 1 lần)
+_lock = threading.Lock()
+_backend = None
+_logger = None
+
+
+def get_log_backend():
+    global _backend
+    with _lock:
+        if _backend is None:
+            _backend = BACKENDS[LOG_BACKEND]()
+            migrate_legacy_json(_backend)
+        return _backend
+
+
+def _get_logger():
+    global _logger
+    backend = get_log_backend()
+    with _lock:
+        if _logger is None:
+            _logger = ViolationLogger(backend)
+            atexit.register(_logger.flush)
+        return _logger
+
+
+def save_violation_record(record: dict):
+    """Lưu bản ghi vi phạm (ghi nền, theo batch)."""
+    record["saved_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    _get_logger().add(record)
+
+
+def update_violation_record(record_id: str, updates: dict):
+    """Cập nhật bản ghi đã lưu (vd: biển số OCR xong sau khi vi phạm được ghi)."""
+    _get_logger().update(record_id, updates)
+
+
+def flush_violation_log(timeout=10):
+    """Chờ ghi hết các bản ghi đang đợi (gọi khi kết thúc 1 lần chạy)."""
+    if _logger is not None:
+        return _logger.flush(timeout)
+    return True
+
+
+def load_violation_records():
+    """Đọc toàn bộ bản ghi vi phạm qua backend hiện tại."""
+    flush_violation_log()
+    return list(get_log_backend().iter_records())
+
+
+def query_violation_records(offset=0, limit=20, video=None, plate=None, date_from=None, date_to=None):
+    """
+    1 trang bản ghi (mới → cũ) theo bộ lọc → (tổng số khớp, list bản ghi).
+    SQLite lọc bằng index; JSONL lọc trên cache đọc tăng dần.
+    """
+    flush_violation_log()
+    return get_log_backend().query(offset=offset, limit=limit, video=video, plate=plate,
+                                   date_from=date_from, date_to=date_to)
+
+
+def list_violation_videos():
+    return get_log_backend().videos()
+
+
+def _write_records(f, video=None, plate=None, date_from=None, date_to=None):
+    """Ghi mảng JSON các bản ghi khớp bộ lọc vào file (text), từng bản ghi một. Trả về số bản ghi"""
+    flush_violation_log()
+    count = 0
+    f.write("[")
+    for record in get_log_backend().iter_matching(video=video, plate=plate,
+                                                  date_from=date_from, date_to=date_to):
+        f.write(",\n    " if count else "\n    ")
+        f.write(json.dumps(record, ensure_ascii=False))
+        count += 1
+    f.write("\n]\n" if count else "]\n")
+    return count
+
+
+def export_violation_records(path, video=None, plate=None, date_from=None, date_to=None):
+    """Ghi mảng JSON các bản ghi khớp bộ lọc ra file (ghi file tạm rồi rename). Trả về số bản ghi"""
+    with atomic_write(path, "w", encoding="utf-8") as f:
+        count = _write_records(f, video=video, plate=plate, date_from=date_from, date_to=date_to)
+    return count
@@ -0,0 +1,152 @@
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+EVIDENCE_WORKERS = 2
+EVIDENCE_QUEUE_SIZE = 16
+EVIDENCE_FORMAT = "jpg"     # "jpg" hoặc "webp"
+EVIDENCE_QUALITY = 90
+
+_ENCODE_PARAMS = {
+    "jpg": cv2.IMWRITE_JPEG_QUALITY,
+    "webp": cv2.IMWRITE_WEBP_QUALITY,
+}
+
+
+# ==========================
+# 🖼️ EVIDENCE WRITER
+# ==========================
+class EvidenceWriter:
+    """
+    Ghi ảnh bằng chứng vi phạm (crop + context) bằng thread nền.
+    Vòng lặp chính chỉ giao frame + box; encode, vẽ context và ghi đĩa chạy ở đây.
+    Queue đầy → submit() chờ (backpressure), không bỏ ảnh vi phạm.
+    """
+
+    def __init__(self, workers=EVIDENCE_WORKERS, max_queue=EVIDENCE_QUEUE_SIZE,
+                 image_format=EVIDENCE_FORMAT, quality=EVIDENCE_QUALITY, timer=None):
+        if image_format not in _ENCODE_PARAMS:
+            raise ValueError(f"Unsupported evidence format: {image_format}")
+
+        self.image_format = image_format
+        self._timer = timer     # StageTimer (tùy chọn)
+        self._params = [_ENCODE_PARAMS[image_format], int(quality)]
+        self._jobs = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.blocked = 0
+        self.blocked_wait = 0.0
+
+        self._threads = [
+            threading.Thread(target=self._worker, daemon=True)
+            for _ in range(max(1, workers))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def paths(self, folder, name):
+        """Đường dẫn (crop, context) theo định dạng đang dùng"""
+        ext = self.image_format
+        return (
+            os.path.join(folder, f"{name}_crop.{ext}"),
+            os.path.join(folder, f"{name}_context.{ext}")
+        )
+
+    def submit(self, frame, box, crop_path, context_path, on_done=None):
+        """
+        Giao frame (không được sửa sau khi submit) + box cho thread nền.
+        on_done(ok) được gọi trên thread nền sau khi ghi xong (tùy chọn).
+        """
+        job = (frame, box, crop_path, context_path, on_done)
+        try:
+            self._jobs.put_nowait(job)
+        except queue.Full:
+            t0 = time.monotonic()
+            self._jobs.put(job)
+            with self._lock:
+                self.blocked += 1
+                self.blocked_wait += time.monotonic() - t0
+
+        with self._lock:
+            self.submitted += 1
+
+    def _worker(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+
+            *job, on_done = job
+            t0 = time.perf_counter()
+            try:
+                self._write(*job)
+                ok = True
+            except Exception as e:
+                print(f"[EvidenceWriter] ❌ Ghi ảnh lỗi: {e}")
+                ok = False
+            if self._timer is not None:
+                self._timer.add("evidence_write", time.perf_counter() - t0)
+
+            with self._lock:
+                if ok:
+                    self.written += 1
+                else:
+                    self.failed += 1
+
+            if on_done is not None:
+                try:
+                    on_done(ok)
+                except Exception as e:
+                    print(f"[EvidenceWriter] ❌ Callback lỗi: {e}")
+
+    def _write(self, frame, box, crop_path, context_path):
+        x1, y1, x2, y2 = box
+        crop = frame[max(y1, 0):y2, max(x1, 0):x2]
+        if crop.size == 0:
+            return
+
+        os.makedirs(os.path.dirname(crop_path), exist_ok=True)
+        cv2.imwrite(crop_path, crop, self._params)
+
+        # Vẽ trên bản copy: frame có thể dùng chung giữa nhiều vi phạm cùng frame
+        ctx = frame.copy()
+        cv2.rectangle(ctx, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        cv2.putText(ctx, "VIOLATION", (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        cv2.imwrite(context_path, ctx, self._params)
+
+    def close(self, timeout=30):
+        """Chờ ghi hết ảnh đang chờ rồi dừng worker (gọi trong finally)."""
+        if self._closed:
+            return
+        self._closed = True
+
+        deadline = time.monotonic() + timeout
+        for _ in self._threads:
+            try:
+                self._jobs.put(None, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for t in self._threads:
+            t.join(timeout=max(0.0, deadline - time.monotonic()))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._jobs.qsize(),
+                "submitted": self.submitted,
+                "written": self.written,
+                "failed": self.failed,
+                "blocked": self.blocked,
+                "blocked_ms_total": round(self.blocked_wait * 1000, 1)
+            }
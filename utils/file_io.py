@@ -0,0 +1,61 @@
+import os
+import json
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl     # khóa file giữa các process (POSIX)
+except ImportError:
+    fcntl = None
+
+
+# ==========================
+# 🔒 KHÓA FILE GIỮA CÁC PROCESS
+# ==========================
+@contextmanager
+def file_lock(path):
+    """
+    Khóa độc quyền quanh thao tác trên path (file <path>.lock, flock).
+    Không có fcntl (Windows) → không khóa, chỉ dựa vào ghi atomic.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# ==========================
+# 💾 GHI ATOMIC
+# ==========================
+@contextmanager
+def atomic_write(path, mode="w", encoding=None, fsync=False):
+    """
+    Ghi vào file tạm cạnh path (tên riêng cho mỗi lần ghi → an toàn giữa thread / process),
+    đóng xong thì rename đè path: reader không bao giờ thấy file ghi dở.
+    Lỗi giữa chừng → xóa file tạm, path giữ nguyên.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(path, data, fsync=False, **dump_kwargs):
+    with atomic_write(path, "w", encoding="utf-8", fsync=fsync) as f:
+        json.dump(data, f, **dump_kwargs)
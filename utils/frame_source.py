@@ -0,0 +1,220 @@
+import os
+import queue
+import logging
+import threading
+import time
+from datetime import datetime
+
+import cv2
+
+from utils.profiling import null_timer
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+SOURCE_MODES = ("file", "live", "replay")
+LIVE_PREFIXES = ("rtsp://", "rtsps://", "rtmp://", "http://", "https://", "udp://", "tcp://")
+RECONNECT_BACKOFF = 0.5         # giây chờ lần reconnect đầu, nhân đôi mỗi lần lỗi
+RECONNECT_MAX_BACKOFF = 10.0
+MAX_RECONNECTS = None           # None → thử lại tới khi dừng (camera); số → bỏ cuộc sau N lần
+
+
+def detect_mode(source):
+    """Chỉ số camera / URL stream → "live", còn lại → "file" ("replay" phải chọn rõ)"""
+    if isinstance(source, int) or str(source).isdigit():
+        return "live"
+    if str(source).lower().startswith(LIVE_PREFIXES):
+        return "live"
+    return "file"
+
+
+def source_name(source):
+    """Tên luồng dùng cho ROI / thư mục bằng chứng: tên file, đoạn cuối URL hoặc camera_<idx>"""
+    if isinstance(source, int) or str(source).isdigit():
+        return f"camera_{source}"
+    return os.path.basename(str(source).rstrip("/")) or "camera"
+
+
+def capture_datetime(t_capture):
+    """Đổi thời điểm capture (time.monotonic) sang giờ thực (datetime)"""
+    return datetime.fromtimestamp(time.time() - (time.monotonic() - t_capture))
+
+
+# ==========================
+# 🎥 FRAME SOURCE
+# ==========================
+class FrameSource:
+    """
+    Bọc cv2.VideoCapture theo loại nguồn:
+    - "file": đọc tuần tự, hết file / lỗi đọc → kết thúc
+    - "live": camera / RTSP – lỗi đọc → reconnect với backoff tăng dần
+    - "replay": phát lại file đúng FPS gốc (thay camera khi test), hết file → kết thúc
+    Nguồn live / replay được FrameReader đọc theo kiểu "chỉ giữ frame mới nhất".
+    """
+
+    def __init__(self, source, mode=None, backoff=RECONNECT_BACKOFF, max_backoff=RECONNECT_MAX_BACKOFF,
+                 max_reconnects=MAX_RECONNECTS):
+        mode = mode or detect_mode(source)
+        if mode not in SOURCE_MODES:
+            raise ValueError(f"Unknown source mode: {mode}")
+
+        self.source = int(source) if str(source).isdigit() else source
+        self.mode = mode
+        self.name = source_name(source)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_reconnects = max_reconnects
+
+        self.reconnects = 0
+        self.read_failures = 0
+        self.cap = cv2.VideoCapture(self.source)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25
+        self.frame_size = (
+            int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        )
+
+        self._replay_t0 = None
+        self._replay_n = 0
+
+    @property
+    def live(self):
+        """Nguồn thời gian thực (không chờ consumer, giữ frame mới nhất)"""
+        return self.mode in ("live", "replay")
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        """(ok, frame). Replay: chờ tới đúng thời điểm của frame theo FPS gốc"""
+        if self.mode == "replay":
+            now = time.monotonic()
+            if self._replay_t0 is None:
+                self._replay_t0 = now
+            delay = self._replay_t0 + self._replay_n / self.fps - now
+            if delay > 0:
+                time.sleep(delay)
+            self._replay_n += 1
+
+        ok, frame = self.cap.read()
+        if not ok:
+            self.read_failures += 1
+        return ok, frame
+
+    def reconnect(self, stop_flag=None):
+        """
+        Mở lại nguồn live sau lỗi đọc, chờ backoff tăng dần giữa các lần thử.
+        False nếu không phải nguồn live, bị dừng hoặc hết số lần thử.
+        """
+        if self.mode != "live":
+            return False
+
+        delay = self.backoff
+        attempts = 0
+        while self.max_reconnects is None or attempts < self.max_reconnects:
+            attempts += 1
+            logging.warning(f"⚠️ [{self.name}] Mất tín hiệu, kết nối lại sau {delay:.1f}s (lần {attempts})")
+            if stop_flag is not None:
+                if stop_flag.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
+
+            self.cap.release()
+            self.cap = cv2.VideoCapture(self.source)
+            if self.cap.isOpened():
+                ok, _ = self.cap.read()
+                if ok:
+                    self.reconnects += 1
+                    logging.info(f"✅ [{self.name}] Đã kết nối lại")
+                    return True
+            delay = min(delay * 2, self.max_backoff)
+
+        logging.error(f"❌ [{self.name}] Không kết nối lại được sau {attempts} lần")
+        return False
+
+    def release(self):
+        if self.cap.isOpened():
+            self.cap.release()
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "fps": self.fps,
+            "reconnects": self.reconnects,
+            "read_failures": self.read_failures
+        }
+
+
+# ==========================
+# 📥 THREAD ĐỌC FRAME
+# ==========================
+class FrameReader:
+    """
+    Đọc frame từ FrameSource vào queue: item (frame_idx, frame, thời điểm capture), None khi hết.
+    Thời điểm capture (time.monotonic) lấy ngay sau khi đọc → dùng cho latency + timestamp vi phạm.
+    - Nguồn live / replay hoặc realtime=True (cả với file): queue 1 chỗ, frame mới ghi đè
+      frame cũ chưa xử lý (latest-frame) → không xử lý frame đã trễ cả batch
+    - Còn lại: queue maxsize, chờ consumer (tối đa 1s / frame)
+    """
+
+    def __init__(self, source, maxsize, realtime=False, stop_flag=None, timer=None):
+        self.source = source
+        self.timer = timer or null_timer()
+        self.realtime = realtime or source.live
+        self.queue = queue.Queue(maxsize=1 if self.realtime else maxsize)
+        self.stop_flag = stop_flag
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        source, frame_queue, stop_flag = self.source, self.queue, self.stop_flag
+        idx = 0
+        while source.is_opened():
+            if stop_flag and stop_flag.is_set():
+                break
+            with self.timer.stage("decode"):
+                ret, frame = source.read()
+            if not ret:
+                # Camera mất tín hiệu tạm thời → kết nối lại thay vì dừng
+                if source.reconnect(stop_flag):
+                    continue
+                break
+            idx += 1
+            item = (idx, frame, time.monotonic())
+
+            if self.realtime:
+                # Realtime: không chờ → bỏ frame cũ nhất, giữ frame mới nhất
+                while True:
+                    try:
+                        frame_queue.put_nowait(item)
+                        break
+                    except queue.Full:
+                        try:
+                            frame_queue.get_nowait()
+                            self.dropped += 1
+                        except queue.Empty:
+                            pass
+                continue
+
+            try:
+                frame_queue.put(item, timeout=1)
+            except queue.Full:
+                self.dropped += 1
+                # Nếu queue đầy, check stop_flag
+                if stop_flag and stop_flag.is_set():
+                    break
+                pass
+        source.release()
+        # Marker kết thúc: live có thể đang đầy (1 chỗ) → chờ consumer lấy
+        while True:
+            try:
+                frame_queue.put(None, timeout=1)
+                break
+            except queue.Full:
+                if stop_flag and stop_flag.is_set():
+                    break
@@ -0,0 +1,143 @@
+import threading
+import time
+
+import cv2
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+PREVIEW_WIDTH = 960         # độ rộng ảnh preview gửi lên GUI (px)
+PREVIEW_MAX_FPS = 10        # giới hạn FPS preview (độc lập với FPS xử lý)
+PREVIEW_JPEG_QUALITY = 75
+
+
+# ==========================
+# 📺 PREVIEW CHANNEL (latest-frame, thread riêng)
+# ==========================
+class PreviewChannel:
+    """
+    Kênh preview cho GUI: chỉ giữ frame MỚI NHẤT.
+    - Pipeline gọi wants() để biết có cần vẽ / gửi frame không (theo max_fps),
+      rồi publish(frame) – chỉ gán 1 tham chiếu, không bao giờ block
+    - Thread riêng downscale + encode JPEG 1 lần / frame được nhận
+    - GUI gọi latest(after_seq) để lấy JPEG mới nhất (bytes) cho st.image
+    Frame không được sửa sau khi publish (giống AnnotatedVideoWriter.write).
+    """
+
+    def __init__(self, width=PREVIEW_WIDTH, max_fps=PREVIEW_MAX_FPS, quality=PREVIEW_JPEG_QUALITY):
+        self.width = width
+        self.max_fps = max_fps
+        self.quality = quality
+
+        self._cond = threading.Condition()
+        self._pending = None        # frame BGR chờ encode
+        self._jpeg = None           # JPEG mới nhất
+        self._seq = 0
+        self._next_due = 0.0
+        self._closed = False
+
+        self.published = 0
+        self.skipped = 0            # bỏ qua do giới hạn FPS
+        self.replaced = 0           # frame chưa kịp encode đã bị frame mới thay
+        self.encoded = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def configure(self, width=None, max_fps=None, quality=None):
+        """Đổi cấu hình khi đang chạy (áp dụng từ frame tiếp theo)"""
+        if width is not None:
+            self.width = width
+        if max_fps is not None:
+            self.max_fps = max_fps
+        if quality is not None:
+            self.quality = quality
+
+    def wants(self, frame_idx=None):
+        """Đã đến lượt gửi frame preview chưa (theo max_fps)"""
+        return time.monotonic() >= self._next_due
+
+    def publish(self, frame):
+        """Giao frame cho thread encode. Trả về False nếu bị bỏ qua do giới hạn FPS"""
+        now = time.monotonic()
+        if now < self._next_due:
+            self.skipped += 1
+            return False
+        self._next_due = now + 1.0 / self.max_fps if self.max_fps else now
+
+        with self._cond:
+            if self._pending is not None:
+                self.replaced += 1
+            self._pending = frame
+            self.published += 1
+            self._cond.notify_all()
+        return True
+
+    # Dùng trực tiếp làm frame_callback của process_video
+    __call__ = publish
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                frame, self._pending = self._pending, None
+
+            try:
+                jpeg = self._encode(frame)
+            except Exception as e:
+                print(f"[PreviewChannel] ❌ Encode lỗi: {e}")
+                continue
+
+            with self._cond:
+                self._jpeg = jpeg
+                self._seq += 1
+                self.encoded += 1
+                self._cond.notify_all()
+
+    def _encode(self, frame):
+        h, w = frame.shape[:2]
+        if self.width and w > self.width:
+            frame = cv2.resize(frame, (int(self.width), int(round(h * self.width / w))),
+                               interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(self.quality)])
+        if not ok:
+            raise RuntimeError("cv2.imencode failed")
+        return buf.tobytes()
+
+    def latest(self, after_seq=0, timeout=None):
+        """
+        (seq, jpeg bytes) của frame mới hơn after_seq,
+        chờ tối đa timeout giây; None nếu chưa có frame mới.
+        """
+        with self._cond:
+            if timeout:
+                self._cond.wait_for(lambda: self._seq > after_seq or self._closed, timeout)
+            if self._seq <= after_seq or self._jpeg is None:
+                return None
+            return self._seq, self._jpeg
+
+    def clear(self):
+        """Bỏ frame đang chờ + frame cuối (khi dừng / bắt đầu video mới)"""
+        with self._cond:
+            self._pending = None
+            self._jpeg = None
+            self._next_due = 0.0
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=1)
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "skipped": self.skipped,
+            "replaced": self.replaced,
+            "encoded": self.encoded,
+            "width": self.width,
+            "max_fps": self.max_fps
+        }
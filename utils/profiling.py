@@ -0,0 +1,218 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import nullcontext
+
+import numpy as np
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+INSTRUMENT = False          # Đo thời gian từng bước của pipeline
+PROFILE_MODE = None         # None | "cprofile" | "sampling"
+STAGE_MAX_SAMPLES = 5000    # số mẫu giữ lại / stage để tính percentile
+SAMPLING_INTERVAL = 0.005   # giây giữa 2 lần lấy mẫu stack
+PROFILE_TOP_N = 25
+
+PROFILE_MODES = (None, "cprofile", "sampling")
+
+_NULL_STAGE = nullcontext()
+
+
+# ==========================
+# ⏱️ STAGE TIMER
+# ==========================
+class _Stage:
+    __slots__ = ("timer", "name", "t0")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class StageTimer:
+    """
+    Đo latency theo stage (decode, resize, detect, tracking, OCR, ...):
+        with timer.stage("vehicle_detection"): ...
+    Tắt (enabled=False) → stage() trả về context rỗng dùng chung, gần như không tốn gì.
+    Thread-safe: worker nền (OCR, evidence, encode video) ghi chung 1 timer.
+    """
+
+    def __init__(self, enabled=INSTRUMENT, max_samples=STAGE_MAX_SAMPLES):
+        self.enabled = enabled
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples = {}      # stage → deque thời gian (giây)
+        self._counts = Counter()
+        self._totals = Counter()
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def add(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(seconds)
+            self._counts[name] += 1
+            self._totals[name] += seconds
+
+    def summary(self):
+        """{stage: {count, total_ms, avg_ms, p50_ms, p95_ms, p99_ms, max_ms}} hoặc None nếu tắt"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            snapshot = {name: np.array(s) * 1000 for name, s in self._samples.items()}
+            counts, totals = dict(self._counts), dict(self._totals)
+
+        result = {}
+        for name, ms in sorted(snapshot.items(), key=lambda kv: -totals[kv[0]]):
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            result[name] = {
+                "count": counts[name],
+                "total_ms": round(totals[name] * 1000, 1),
+                "avg_ms": round(totals[name] * 1000 / counts[name], 3),
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(float(ms.max()), 3)
+            }
+        return result
+
+
+def null_timer():
+    return StageTimer(enabled=False)
+
+
+# ==========================
+# 🔬 SAMPLING PROFILER
+# ==========================
+class SamplingProfiler:
+    """
+    Profiler lấy mẫu stack của 1 thread (mặc định thread gọi start) mỗi interval giây.
+    Overhead thấp hơn cProfile, không cần thư viện ngoài.
+    """
+
+    def __init__(self, interval=SAMPLING_INTERVAL, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = 0
+        self._self = Counter()      # hàm đang chạy (đỉnh stack)
+        self._cumulative = Counter()  # hàm có mặt trong stack
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    @staticmethod
+    def _label(frame):
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            self._self[self._label(frame)] += 1
+            seen = set()
+            while frame is not None:
+                label = self._label(frame)
+                if label not in seen:
+                    seen.add(label)
+                    self._cumulative[label] += 1
+                frame = frame.f_back
+
+    def summary(self, top_n=PROFILE_TOP_N):
+        total = max(1, self.samples)
+        return {
+            "mode": "sampling",
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "self": [
+                {"function": fn, "pct": round(100 * n / total, 1)}
+                for fn, n in self._self.most_common(top_n)
+            ],
+            "cumulative": [
+                {"function": fn, "pct": round(100 * n / total, 1)}
+                for fn, n in self._cumulative.most_common(top_n)
+            ]
+        }
+
+
+# ==========================
+# 🧪 PROFILE 1 LẦN CHẠY
+# ==========================
+class RunProfiler:
+    """
+    Bọc 1 lần chạy pipeline bằng cProfile hoặc sampling profiler.
+    cProfile: lưu file .prof (xem bằng snakeviz / pstats) nếu có output_path.
+    """
+
+    def __init__(self, mode=PROFILE_MODE, output_path=None, top_n=PROFILE_TOP_N):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.output_path = output_path
+        self.top_n = top_n
+        self._profiler = None
+
+    def start(self):
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.mode == "sampling":
+            self._profiler = SamplingProfiler()
+            self._profiler.start()
+        return self
+
+    def stop(self):
+        """Dừng profiler, trả về tóm tắt (None nếu không bật)"""
+        if self._profiler is None:
+            return None
+
+        if self.mode == "sampling":
+            self._profiler.stop()
+            return self._profiler.summary(self.top_n)
+
+        self._profiler.disable()
+        if self.output_path:
+            os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+            self._profiler.dump_stats(self.output_path)
+
+        buf = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=buf)
+        stats.sort_stats("cumulative").print_stats(self.top_n)
+        return {
+            "mode": "cprofile",
+            "stats_file": self.output_path,
+            "top_cumulative": buf.getvalue()
+        }
@@ -0,0 +1,82 @@
+import math
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+REALTIME_LATENCY_BUDGET = 0.3   # giây: độ trễ tối đa từ lúc đọc frame tới lúc xử lý xong
+MAX_FRAME_SKIP = 6
+MAX_STEP_RATIO = 0.6            # xe không được đi quá 60% ngưỡng match giữa 2 frame xử lý
+
+
+# ==========================
+# ⏱️ ADAPTIVE FRAME SKIP
+# ==========================
+class AdaptiveFrameSkip:
+    """
+    Điều chỉnh frame skip theo độ trễ end-to-end đo được:
+    trễ > budget → bỏ thêm frame, trễ < 1/2 budget → xử lý dày lại.
+    """
+
+    def __init__(self, budget=REALTIME_LATENCY_BUDGET, base_skip=1, max_skip=MAX_FRAME_SKIP,
+                 alpha=0.2, cooldown=5):
+        self.budget = budget
+        self.base_skip = max(1, base_skip)
+        self.max_skip = max(self.base_skip, max_skip)
+        self.alpha = alpha
+        self.cooldown = cooldown
+
+        self.skip = self.base_skip
+        self.latency = None     # EMA (giây)
+        self._since_change = 0
+
+        self._skip_total = 0
+        self._observed = 0
+
+    def configure(self, budget=None, base_skip=None, max_skip=None):
+        """Đổi cấu hình khi đang chạy (config camera reload), giữ skip hiện tại trong khoảng mới"""
+        if budget is not None:
+            self.budget = budget
+        if base_skip is not None:
+            self.base_skip = max(1, base_skip)
+        if max_skip is not None:
+            self.max_skip = max_skip
+        self.max_skip = max(self.base_skip, self.max_skip)
+        self.skip = min(max(self.skip, self.base_skip), self.max_skip)
+
+    def observe(self, latency):
+        """Ghi nhận độ trễ của 1 frame vừa xử lý xong"""
+        self.latency = latency if self.latency is None else (
+            self.alpha * latency + (1 - self.alpha) * self.latency
+        )
+        self._observed += 1
+        self._skip_total += self.skip
+        self._since_change += 1
+
+        # Chờ vài frame sau mỗi lần đổi để EMA kịp phản ánh
+        if self._since_change < self.cooldown:
+            return
+
+        if self.latency > self.budget and self.skip < self.max_skip:
+            self.skip += 1
+            self._since_change = 0
+        elif self.latency < self.budget * 0.5 and self.skip > self.base_skip:
+            self.skip -= 1
+            self._since_change = 0
+
+    def effective_skip(self, speed, max_distance):
+        """
+        Skip thực tế: không để xe di chuyển quá MAX_STEP_RATIO * max_distance
+        giữa 2 frame xử lý (giữ đúng giả định match 55px của tracker)
+        """
+        if speed and speed > 0:
+            motion_cap = max(1, math.floor(max_distance * MAX_STEP_RATIO / speed))
+            return max(1, min(self.skip, motion_cap))
+        return self.skip
+
+    def stats(self):
+        return {
+            "frame_skip": self.skip,
+            "frame_skip_avg": round(self._skip_total / self._observed, 2) if self._observed else None,
+            "latency_ms_ema": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "latency_budget_ms": round(self.budget * 1000, 1)
+        }
@@ -0,0 +1,58 @@
+import hashlib
+import os
+
+import cv2
+
+from utils.file_io import atomic_write
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+THUMB_DIR = os.path.abspath(os.path.join(
+    os.path.dirname(__file__),
+    "..", "output", "thumbnails"
+))
+THUMB_WIDTH = 320
+THUMB_QUALITY = 80
+
+
+# ==========================
+# 🖼️ THUMBNAIL CACHE (trên đĩa)
+# ==========================
+def thumbnail_path(src_path, width=THUMB_WIDTH, thumb_dir=THUMB_DIR):
+    """
+    Thumbnail JPEG của ảnh src_path, tạo 1 lần rồi cache trên đĩa.
+    Key = đường dẫn gốc + mtime + width → ảnh gốc bị ghi đè thì tự tạo lại.
+    Trả về None nếu ảnh gốc không tồn tại / không đọc được.
+    """
+    try:
+        st = os.stat(src_path)
+    except OSError:
+        return None
+
+    key = hashlib.sha1(f"{os.path.abspath(src_path)}|{st.st_mtime_ns}|{width}".encode("utf-8")).hexdigest()
+    path = os.path.join(thumb_dir, key[:2], f"{key}.jpg")
+    if os.path.exists(path):
+        return path
+
+    img = cv2.imread(src_path)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    if w > width:
+        img = cv2.resize(img, (width, max(1, int(round(h * width / w)))), interpolation=cv2.INTER_AREA)
+
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, THUMB_QUALITY])
+    if not ok:
+        return None
+
+    # Ghi file tạm (tên riêng / lần ghi: các session Streamlit là thread cùng process) rồi rename
+    # → không bao giờ đọc phải thumbnail ghi dở
+    try:
+        with atomic_write(path, "wb") as f:
+            f.write(buf.tobytes())
+    except OSError:
+        # Session khác đã tạo xong cùng thumbnail → coi như thành công
+        if not os.path.exists(path):
+            raise
+    return path
@@ -0,0 +1,184 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+OUTPUT_MODE = "full"        # "full" | "downscale" | "nth" | "events"
+OUTPUT_WIDTH = 960          # dùng cho "downscale" (và các mode khác nếu truyền vào)
+OUTPUT_EVERY_N = 5          # mode "nth": ghi 1 frame / N frame
+EVENT_PRE_FRAMES = 50       # mode "events": số frame giữ lại trước vi phạm
+EVENT_POST_FRAMES = 75      # mode "events": số frame ghi thêm sau vi phạm
+EVENT_BUFFER_QUALITY = 90   # mode "events": frame trong buffer trước vi phạm giữ dạng JPEG (ở size output)
+OUTPUT_QUEUE_SIZE = 16
+
+OUTPUT_MODES = ("full", "downscale", "nth", "events")
+
+
+# ==========================
+# 🎬 VIDEO WRITER (thread riêng)
+# ==========================
+class AnnotatedVideoWriter:
+    """
+    Encode video kết quả trên thread riêng với queue giới hạn.
+    Main thread gọi wants() để biết frame có được ghi không (không cần vẽ nếu không ghi),
+    write() để giao frame, mark_event() khi có vi phạm (mode "events").
+    Mode "events": pre_frames frame trước vi phạm giữ ở size output, nén JPEG
+    (~vài trăm KB / frame 1080p thay vì ~6 MB ảnh thô).
+    """
+
+    def __init__(self, output_path, fps, frame_size, mode=OUTPUT_MODE, output_width=None,
+                 every_n=OUTPUT_EVERY_N, pre_frames=EVENT_PRE_FRAMES, post_frames=EVENT_POST_FRAMES,
+                 max_queue=OUTPUT_QUEUE_SIZE, timer=None):
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode: {mode}")
+        if mode == "downscale" and output_width is None:
+            output_width = OUTPUT_WIDTH
+
+        self.output_path = output_path
+        self.mode = mode
+        self._timer = timer     # StageTimer (tùy chọn)
+        self.every_n = max(1, every_n)
+        self.post_frames = post_frames
+
+        w, h = frame_size
+        if output_width and output_width < w:
+            self.size = (int(output_width), int(round(h * output_width / w)))
+        else:
+            self.size = (w, h)
+
+        # mode "nth": 1 frame output = every_n frame nguồn → giảm fps để video giữ đúng thời lượng
+        out_fps = fps / self.every_n if mode == "nth" else fps
+        self._last_slot = -1    # mode "nth": slot output (frame_idx // every_n) đã ghi gần nhất
+        self._writer = cv2.VideoWriter(
+            output_path, cv2.VideoWriter_fourcc(*"mp4v"), out_fps, self.size
+        )
+
+        self._pre_buffer = deque()     # JPEG bytes, tối đa pre_frames frame
+        self._pre_frames = max(0, pre_frames)
+        self._pre_buffer_bytes = 0
+        self._record_until = -1
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.written = 0
+        self.blocked = 0
+        self.events = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def wants(self, frame_idx):
+        """Frame này có được ghi ra video không"""
+        if self.mode == "nth":
+            # Theo slot thời gian chứ không theo frame_idx % every_n: với frame skip,
+            # frame xử lý có thể không bao giờ rơi vào bội số của every_n
+            return frame_idx // self.every_n > self._last_slot
+        # "events" vẫn cần frame đã vẽ cho buffer trước vi phạm
+        return True
+
+    def write(self, frame_idx, frame):
+        """Giao frame cho thread encode (frame không được sửa sau khi gọi)"""
+        if not self.wants(frame_idx):
+            return
+        repeats = 1
+        if self.mode == "nth":
+            # Skip > every_n nhảy qua slot → lặp frame để video không bị tua nhanh
+            slot = frame_idx // self.every_n
+            repeats = slot - self._last_slot if self._last_slot >= 0 else 1
+            self._last_slot = slot
+        for _ in range(repeats):
+            self._put(("frame", frame_idx, frame))
+
+    def mark_event(self, frame_idx):
+        """Đánh dấu vi phạm tại frame_idx (mode "events")"""
+        if self.mode == "events":
+            self._put(("event", frame_idx, None))
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.blocked += 1
+            self._queue.put(item)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            kind, frame_idx, frame = item
+            try:
+                if kind == "event":
+                    self.events += 1
+                    # Ghi lại đoạn trước vi phạm rồi ghi tiếp post_frames frame
+                    while self._pre_buffer:
+                        self._encode(cv2.imdecode(self._pop_pre_buffer(), cv2.IMREAD_COLOR))
+                    self._record_until = max(self._record_until, frame_idx + self.post_frames)
+                elif self.mode != "events" or frame_idx <= self._record_until:
+                    self._encode(frame)
+                elif self._pre_frames:
+                    if len(self._pre_buffer) >= self._pre_frames:
+                        self._pop_pre_buffer()
+                    buf = self._compress(frame)
+                    self._pre_buffer.append(buf)
+                    self._pre_buffer_bytes += buf.nbytes
+            except Exception as e:
+                print(f"[AnnotatedVideoWriter] ❌ Encode lỗi: {e}")
+
+    def _pop_pre_buffer(self):
+        buf = self._pre_buffer.popleft()
+        self._pre_buffer_bytes -= buf.nbytes
+        return buf
+
+    def _compress(self, frame):
+        """Frame cho buffer trước vi phạm: resize về size output + JPEG"""
+        h, w = frame.shape[:2]
+        if (w, h) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, EVENT_BUFFER_QUALITY])
+        if not ok:
+            raise RuntimeError("cv2.imencode failed")
+        return buf
+
+    def _encode(self, frame):
+        t0 = time.perf_counter()
+        h, w = frame.shape[:2]
+        if (w, h) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        self._writer.write(frame)
+        self.written += 1
+        if self._timer is not None:
+            self._timer.add("video_encode", time.perf_counter() - t0)
+
+    def close(self, timeout=30):
+        """Encode nốt các frame trong queue rồi đóng file"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+        self._writer.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "size": list(self.size),
+                "written": self.written,
+                "events": self.events,
+                "blocked": self.blocked,
+                "pre_buffer_kb": round(self._pre_buffer_bytes / 1024, 1),
+                "queue_depth": self._queue.qsize()
+            }
@@ -0,0 +1,71 @@
+import threading
+from collections import OrderedDict
+
+# ==========================
+# ⚙️ CONFIG
+# ==========================
+VIOLATION_INDEX_SIZE = 200      # số sự kiện vi phạm gần nhất giữ trong RAM
+
+
+# ==========================
+# 🗂️ VIOLATION EVENT INDEX (in-process)
+# ==========================
+class ViolationIndex:
+    """
+    Index vi phạm trong RAM cho GUI realtime (không quét thư mục ảnh):
+    - Pipeline publish(record) khi ghi vi phạm, update() khi có biển số / ảnh đã ghi xong
+    - Chỉ giữ max_events sự kiện gần nhất (cũ nhất bị bỏ)
+    - version tăng mỗi lần thay đổi → GUI chỉ vẽ lại khi version đổi
+    Thread-safe: pipeline, evidence writer và GUI dùng chung.
+    """
+
+    def __init__(self, max_events=VIOLATION_INDEX_SIZE):
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self._events = OrderedDict()    # record_id → event (cũ → mới)
+        self.version = 0
+
+    def publish(self, record):
+        """Thêm sự kiện vi phạm (dict record như data_logger, cần record_id)"""
+        event = dict(record)
+        event.setdefault("evidence_ready", False)
+        with self._lock:
+            self._events[event["record_id"]] = event
+            while len(self._events) > self.max_events:
+                self._events.popitem(last=False)
+            self.version += 1
+
+    def update(self, record_id, patch):
+        """Patch sự kiện đã có (biển số, ảnh đã ghi xong, ...). False nếu đã bị đẩy khỏi window"""
+        with self._lock:
+            event = self._events.get(record_id)
+            if event is None:
+                return False
+            event.update(patch)
+            self.version += 1
+            return True
+
+    def recent(self, n=None, video=None):
+        """n sự kiện mới nhất (mới → cũ), lọc theo video nếu có"""
+        items = []
+        with self._lock:
+            for event in reversed(self._events.values()):
+                if video is not None and event.get("video") != video:
+                    continue
+                items.append(dict(event))
+                if n is not None and len(items) >= n:
+                    break
+        return items
+
+    def clear(self, video=None):
+        with self._lock:
+            if video is None:
+                self._events.clear()
+            else:
+                for record_id in [k for k, e in self._events.items() if e.get("video") == video]:
+                    del self._events[record_id]
+            self.version += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._events)